@@ -4,75 +4,110 @@ Converts JSONL and CSV results into organized Excel workbooks.
 """
 
 import argparse
-import json
-import csv
 import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict
-from collections import defaultdict
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+import pandas as pd
+import xlsxwriter
+
+
+LEVELS = ['L0', 'L1', 'L2', 'L3', 'P']
+SCORE_COLUMNS = ['factuality', 'helpfulness', 'structure', 'conciseness', 'total_score']
 
 
 def load_inference_results(jsonl_file: str) -> List[Dict]:
     """Load inference results from JSONL."""
-    results = []
-
-    with open(jsonl_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                results.append(json.loads(line))
+    # Read raw bytes: orjson parses UTF-8 bytes directly
+    with open(jsonl_file, 'rb') as f:
+        results = [json_loads(line) for line in f if not line.isspace()]
 
     print(f"Loaded {len(results)} inference results")
     return results
 
 
-def load_judge_scores(csv_file: str) -> List[Dict]:
+def load_judge_scores(csv_file: str) -> pd.DataFrame:
     """Load absolute judge scores from CSV."""
-    scores = []
+    df = pd.read_csv(
+        csv_file,
+        dtype={
+            'question_id': 'int64',
+            'factuality': 'float64',
+            'helpfulness': 'float64',
+            'structure': 'float64',
+            'conciseness': 'float64',
+            'total_score': 'float64',
+            'reasoning': str
+        },
+        keep_default_na=False  # Keep empty reasoning as '' rather than NaN
+    )
+
+    print(f"Loaded {len(df)} judge scores")
+    return df
 
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # Convert numeric fields
-            row['factuality'] = float(row['factuality'])
-            row['helpfulness'] = float(row['helpfulness'])
-            row['structure'] = float(row['structure'])
-            row['conciseness'] = float(row['conciseness'])
-            row['total_score'] = float(row['total_score'])
-            row['question_id'] = int(row['question_id'])
 
-            scores.append(row)
+def compute_level_means(scores: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute average judge scores per (model_id, level).
 
-    print(f"Loaded {len(scores)} judge scores")
-    return scores
+    Returns:
+        DataFrame indexed by (model_id, level), ordered by model and prompt
+        level, with one column per criterion
+    """
+    means = scores.groupby(['model_id', 'level'], sort=True)[SCORE_COLUMNS].mean()
 
+    order = pd.MultiIndex.from_product(
+        [sorted(scores['model_id'].unique()), LEVELS],
+        names=['model_id', 'level']
+    )
 
-def organize_by_model(data: List[Dict], key: str = 'model_id') -> Dict[str, List[Dict]]:
-    """Organize data by model_id."""
-    organized = defaultdict(list)
+    return means.reindex(order).dropna(how='all')
 
-    for item in data:
-        model_id = item[key]
-        organized[model_id].append(item)
 
-    return dict(organized)
+def create_header_format(wb: xlsxwriter.Workbook):
+    """Create the shared header cell format for a workbook."""
+    return wb.add_format({
+        'bold': True,
+        'font_color': 'white',
+        'bg_color': '#4472C4',
+        'align': 'center',
+        'valign': 'vcenter'
+    })
 
 
-def create_quality_excel(scores: List[Dict], output_file: str):
+def create_quality_excel(scores: pd.DataFrame, output_file: str):
     """Create Excel workbook with quality scores per model."""
     print(f"\nCreating quality scores workbook: {output_file}")
 
-    # Organize scores by model
-    model_scores = organize_by_model(scores)
+    level_means = compute_level_means(scores)
 
-    wb = Workbook()
-    wb.remove(wb.active)  # Remove default sheet
+    # Sort once so every model group below comes out ordered by question and
+    # level, and truncate reasoning once for the whole column
+    scores = scores.sort_values(['model_id', 'question_id', 'level'], kind='stable')
+    scores = scores.assign(reasoning=scores['reasoning'].str.slice(stop=100))
+    columns = ['question_id', 'category', 'level', *SCORE_COLUMNS, 'reasoning']
+
+    # constant_memory flushes each row as soon as the next one starts,
+    # so rows must be written strictly top to bottom
+    wb = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    header_format = create_header_format(wb)
+    wrap_format = wb.add_format({'text_wrap': True, 'valign': 'top'})
 
     # Create sheet for each model
-    for model_id in sorted(model_scores.keys()):
-        ws = wb.create_sheet(title=model_id[:31])  # Excel sheet name limit
+    for model_id, model_scores in scores.groupby('model_id', sort=True):
+        ws = wb.add_worksheet(model_id[:31])  # Excel sheet name limit
+
+        # Format columns
+        ws.set_column('A:A', 12)
+        ws.set_column('B:B', 15)
+        ws.set_column('C:C', 8)
+        ws.set_column('D:H', 12)
+        ws.set_column('I:I', 40, wrap_format)  # Wrap reasoning without per-cell styling
 
         # Headers
         headers = [
@@ -80,82 +115,25 @@ def create_quality_excel(scores: List[Dict], output_file: str):
             'Factuality', 'Helpfulness', 'Structure', 'Conciseness',
             'Total Score', 'Reasoning'
         ]
-        ws.append(headers)
-
-        # Style headers
-        for cell in ws[1]:
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            cell.alignment = Alignment(horizontal='center', vertical='center')
+        ws.write_row(0, 0, headers, header_format)
+        row_idx = 1
 
         # Add data rows
-        for score in sorted(model_scores[model_id], key=lambda x: (x['question_id'], x['level'])):
-            ws.append([
-                score['question_id'],
-                score['category'],
-                score['level'],
-                score['factuality'],
-                score['helpfulness'],
-                score['structure'],
-                score['conciseness'],
-                score['total_score'],
-                score['reasoning'][:100] if len(score['reasoning']) > 100 else score['reasoning']
-            ])
-
-        # Calculate level averages
-        ws.append([])  # Empty row
-        ws.append(['Level Averages'])
-
-        level_stats = defaultdict(lambda: {
-            'factuality': [], 'helpfulness': [], 'structure': [],
-            'conciseness': [], 'total': []
-        })
-
-        for score in model_scores[model_id]:
-            level = score['level']
-            level_stats[level]['factuality'].append(score['factuality'])
-            level_stats[level]['helpfulness'].append(score['helpfulness'])
-            level_stats[level]['structure'].append(score['structure'])
-            level_stats[level]['conciseness'].append(score['conciseness'])
-            level_stats[level]['total'].append(score['total_score'])
-
-        # Write averages
-        for level in ['L0', 'L1', 'L2', 'L3', 'P']:
-            if level in level_stats and level_stats[level]['total']:
-                avg_fact = sum(level_stats[level]['factuality']) / len(level_stats[level]['factuality'])
-                avg_help = sum(level_stats[level]['helpfulness']) / len(level_stats[level]['helpfulness'])
-                avg_struct = sum(level_stats[level]['structure']) / len(level_stats[level]['structure'])
-                avg_conc = sum(level_stats[level]['conciseness']) / len(level_stats[level]['conciseness'])
-                avg_total = sum(level_stats[level]['total']) / len(level_stats[level]['total'])
-
-                ws.append([
-                    '',
-                    'Average',
-                    level,
-                    round(avg_fact, 2),
-                    round(avg_help, 2),
-                    round(avg_struct, 2),
-                    round(avg_conc, 2),
-                    round(avg_total, 2),
-                    ''
-                ])
+        for row in model_scores[columns].itertuples(index=False, name=None):
+            ws.write_row(row_idx, 0, row)
+            row_idx += 1
 
-        # Format columns
-        ws.column_dimensions['A'].width = 12
-        ws.column_dimensions['B'].width = 15
-        ws.column_dimensions['C'].width = 8
-        ws.column_dimensions['D'].width = 12
-        ws.column_dimensions['E'].width = 12
-        ws.column_dimensions['F'].width = 12
-        ws.column_dimensions['G'].width = 12
-        ws.column_dimensions['H'].width = 12
-        ws.column_dimensions['I'].width = 40
-
-        # Enable text wrapping for reasoning
-        for row in ws.iter_rows(min_row=2):
-            row[8].alignment = Alignment(wrap_text=True, vertical='top')
-
-    wb.save(output_file)
+        # Write level averages
+        row_idx += 1  # Empty row
+        ws.write(row_idx, 0, 'Level Averages')
+        row_idx += 1
+
+        if model_id in level_means.index:
+            for level, *means in level_means.loc[model_id].itertuples(name=None):
+                ws.write_row(row_idx, 0, ['', 'Average', level, *(round(m, 2) for m in means), ''])
+                row_idx += 1
+
+    wb.close()
     print(f"  Saved: {output_file}")
 
 
@@ -171,165 +149,90 @@ def create_metric_excel(results: List[Dict], metric_name: str, metric_key: str,
     """
     print(f"\nCreating {metric_name} workbook: {output_file}")
 
-    # Organize by model
-    model_results = organize_by_model(results)
+    df = pd.DataFrame(results, columns=['model_id', 'question_id', 'category', 'level', metric_key])
+    df[metric_key] = df[metric_key].fillna(0)  # Missing metric counts as 0
 
-    wb = Workbook()
-    wb.remove(wb.active)
+    # One pivot for all models: rows are (model_id, question_id), columns are
+    # levels; a repeated run of the same task keeps its last value
+    matrix = df.pivot_table(
+        index=['model_id', 'question_id'],
+        columns='level',
+        values=metric_key,
+        aggfunc='last'
+    ).reindex(columns=LEVELS)
 
-    # Create sheet for each model
-    for model_id in sorted(model_results.keys()):
-        ws = wb.create_sheet(title=model_id[:31])
+    # Round the whole matrix once; empty cells become None so they stay blank
+    table = matrix.round(3).astype(object).where(matrix.notna(), None)
+    table.insert(0, 'category', df.groupby(['model_id', 'question_id'])['category'].first())
 
-        # Get unique questions and levels
-        questions = sorted(set(r['question_id'] for r in model_results[model_id]))
-        levels = ['L0', 'L1', 'L2', 'L3', 'P']
+    # Per-model level means over the unrounded values (0 for missing levels)
+    level_means = matrix.groupby(level='model_id').mean().fillna(0).round(3)
 
-        # Create headers: question_id, category, L0, L1, L2, L3, P
-        headers = ['question_id', 'category'] + levels
-        ws.append(headers)
+    wb = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    header_format = create_header_format(wb)
+    summary_format = wb.add_format({'bold': True})
 
-        # Style headers
-        for cell in ws[1]:
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-
-        # Organize data by question and level
-        data_matrix = {}
-
-        for result in model_results[model_id]:
-            qid = result['question_id']
-            level = result['level']
-            category = result['category']
-            value = result.get(metric_key, 0)
+    # Create sheet for each model
+    for model_id, model_table in table.groupby(level='model_id', sort=True):
+        ws = wb.add_worksheet(model_id[:31])
 
-            if qid not in data_matrix:
-                data_matrix[qid] = {'category': category}
+        # Format columns
+        ws.set_column('A:B', 15)
+        ws.set_column(2, 1 + len(LEVELS), 12)
 
-            data_matrix[qid][level] = value
+        # Create headers: question_id, category, L0, L1, L2, L3, P
+        headers = ['question_id', 'category'] + LEVELS
+        ws.write_row(0, 0, headers, header_format)
+        row_idx = 1
 
         # Add data rows
-        for qid in questions:
-            if qid not in data_matrix:
-                continue
-
-            row = [qid, data_matrix[qid].get('category', '')]
-
-            for level in levels:
-                value = data_matrix[qid].get(level, '')
-                if isinstance(value, (int, float)):
-                    row.append(round(value, 3))
-                else:
-                    row.append(value)
-
-            ws.append(row)
+        for qid, *row in model_table.droplevel('model_id').itertuples(name=None):
+            ws.write_row(row_idx, 0, [qid, *row])
+            row_idx += 1
 
         # Add summary statistics at the bottom
-        ws.append([])  # Empty row
-        ws.append(['Summary Statistics'])
-
-        summary_row_start = ws.max_row
-
-        # Calculate means for each level
-        means = ['Mean', '']
-
-        for level in levels:
-            values = [data_matrix[qid].get(level, 0) for qid in questions if level in data_matrix[qid]]
-            if values:
-                mean_val = sum(values) / len(values)
-                means.append(round(mean_val, 3))
-            else:
-                means.append(0)
+        row_idx += 1  # Empty row
+        ws.write(row_idx, 0, 'Summary Statistics', summary_format)
+        row_idx += 1
 
-        ws.append(means)
+        ws.write_row(row_idx, 0, ['Mean', '', *level_means.loc[model_id].tolist()])
 
-        # Style summary
-        for cell in ws[summary_row_start]:
-            cell.font = Font(bold=True)
-
-        # Format columns
-        ws.column_dimensions['A'].width = 15
-        ws.column_dimensions['B'].width = 15
-
-        for i, level in enumerate(levels, start=3):
-            col_letter = get_column_letter(i)
-            ws.column_dimensions[col_letter].width = 12
-
-    wb.save(output_file)
+    wb.close()
     print(f"  Saved: {output_file}")
 
 
-def create_comparison_excel(scores: List[Dict], output_file: str):
+def create_comparison_excel(scores: pd.DataFrame, output_file: str):
     """
     Create a model comparison sheet showing average scores by level.
 
     Args:
-        scores: List of judge scores
+        scores: Judge scores DataFrame
         output_file: Output file path
     """
     print(f"\nCreating model comparison workbook: {output_file}")
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Model Comparison"
+    wb = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    ws = wb.add_worksheet("Model Comparison")
+
+    # Average scores per model and level
+    level_means = compute_level_means(scores)
 
-    # Organize scores
-    model_scores = organize_by_model(scores)
+    # Format columns
+    ws.set_column('A:G', 15)
 
     # Headers
     headers = ['Model', 'Level', 'Factuality', 'Helpfulness', 'Structure', 'Conciseness', 'Total Score']
-    ws.append(headers)
-
-    # Style headers
-    for cell in ws[1]:
-        cell.font = Font(bold=True, color="FFFFFF")
-        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-    # Calculate averages for each model and level
-    for model_id in sorted(model_scores.keys()):
-        level_stats = defaultdict(lambda: {
-            'factuality': [], 'helpfulness': [], 'structure': [],
-            'conciseness': [], 'total': []
-        })
-
-        for score in model_scores[model_id]:
-            level = score['level']
-            level_stats[level]['factuality'].append(score['factuality'])
-            level_stats[level]['helpfulness'].append(score['helpfulness'])
-            level_stats[level]['structure'].append(score['structure'])
-            level_stats[level]['conciseness'].append(score['conciseness'])
-            level_stats[level]['total'].append(score['total_score'])
-
-        # Write averages for each level
-        for level in ['L0', 'L1', 'L2', 'L3', 'P']:
-            if level in level_stats and level_stats[level]['total']:
-                avg_fact = sum(level_stats[level]['factuality']) / len(level_stats[level]['factuality'])
-                avg_help = sum(level_stats[level]['helpfulness']) / len(level_stats[level]['helpfulness'])
-                avg_struct = sum(level_stats[level]['structure']) / len(level_stats[level]['structure'])
-                avg_conc = sum(level_stats[level]['conciseness']) / len(level_stats[level]['conciseness'])
-                avg_total = sum(level_stats[level]['total']) / len(level_stats[level]['total'])
-
-                ws.append([
-                    model_id,
-                    level,
-                    round(avg_fact, 2),
-                    round(avg_help, 2),
-                    round(avg_struct, 2),
-                    round(avg_conc, 2),
-                    round(avg_total, 2)
-                ])
+    ws.write_row(0, 0, headers, create_header_format(wb))
 
-    # Format columns
-    for i in range(1, 8):
-        ws.column_dimensions[get_column_letter(i)].width = 15
+    # Write averages for each model and level
+    for row_idx, ((model_id, level), *means) in enumerate(level_means.itertuples(name=None), start=1):
+        ws.write_row(row_idx, 0, [model_id, level, *(round(m, 2) for m in means)])
 
-    wb.save(output_file)
+    wb.close()
     print(f"  Saved: {output_file}")
 
 
-def aggregate_results(runs_file: str, scores_file: str, output_dir: str):
+def aggregate_results(runs_file: str, scores_file: str, output_dir: str, max_workers: int = 5):
     """
     Aggregate all results into Excel workbooks.
 
@@ -337,6 +240,7 @@ def aggregate_results(runs_file: str, scores_file: str, output_dir: str):
         runs_file: Path to runs_llamacpp.jsonl
         scores_file: Path to scores_absolute.csv
         output_dir: Output directory for Excel files
+        max_workers: Number of worker processes writing workbooks in parallel
     """
     print("="*80)
     print("LOADING DATA")
@@ -353,25 +257,28 @@ def aggregate_results(runs_file: str, scores_file: str, output_dir: str):
     print("CREATING EXCEL WORKBOOKS")
     print("="*80)
 
-    # Create quality scores workbook (detailed)
     quality_file = os.path.join(output_dir, 'quality_scores_detailed.xlsx')
-    create_quality_excel(scores, quality_file)
-
-    # Create model comparison workbook (summary)
     comparison_file = os.path.join(output_dir, 'model_comparison.xlsx')
-    create_comparison_excel(scores, comparison_file)
-
-    # Create energy workbook
     energy_file = os.path.join(output_dir, 'energy_per_run.xlsx')
-    create_metric_excel(results, 'Energy', 'energy_joule', energy_file)
-
-    # Create latency workbook
     latency_file = os.path.join(output_dir, 'latency_per_run.xlsx')
-    create_metric_excel(results, 'Latency', 'latency_ms', latency_file)
-
-    # Create output tokens workbook
     tokens_file = os.path.join(output_dir, 'output_tokens_per_run.xlsx')
-    create_metric_excel(results, 'Output Tokens', 'completion_tokens', tokens_file)
+
+    # Workbooks are independent and CPU-bound, so build them in separate processes
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            # Quality scores workbook (detailed)
+            executor.submit(create_quality_excel, scores, quality_file),
+            # Model comparison workbook (summary)
+            executor.submit(create_comparison_excel, scores, comparison_file),
+            # Per-run metric workbooks
+            executor.submit(create_metric_excel, results, 'Energy', 'energy_joule', energy_file),
+            executor.submit(create_metric_excel, results, 'Latency', 'latency_ms', latency_file),
+            executor.submit(create_metric_excel, results, 'Output Tokens', 'completion_tokens', tokens_file)
+        ]
+
+        # Propagate any worker exception
+        for future in futures:
+            future.result()
 
     print("\n" + "="*80)
     print("AGGREGATION COMPLETE")
@@ -407,6 +314,13 @@ def main():
         help='Output directory for Excel files'
     )
 
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=5,
+        help='Number of worker processes for writing workbooks (default: 5)'
+    )
+
     args = parser.parse_args()
 
     # Validate inputs
@@ -419,7 +333,7 @@ def main():
         exit(1)
 
     # Run aggregation
-    aggregate_results(args.runs, args.scores, args.outdir)
+    aggregate_results(args.runs, args.scores, args.outdir, max_workers=args.workers)
 
 
 if __name__ == "__main__":
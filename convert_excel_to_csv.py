@@ -6,6 +6,7 @@ Converts generated_prompts.xlsx (Sheet 1) to category-specific CSV files.
 import argparse
 import os
 import csv
+from contextlib import ExitStack
 from openpyxl import load_workbook
 from collections import defaultdict
 
@@ -25,52 +26,64 @@ def convert_excel_to_csv(excel_file: str, output_dir: str, split_by_category: bo
     wb = load_workbook(excel_file, read_only=True)
     ws = wb['Prompts']
 
-    # Read all data
-    rows = list(ws.iter_rows(values_only=True))
-
-    if not rows:
-        print("Error: Empty worksheet")
-        return
+    # Stream rows instead of materializing the whole sheet
+    rows = ws.iter_rows(values_only=True)
 
     # Get headers
-    headers = rows[0]
-    data_rows = rows[1:]
+    headers = next(rows, None)
 
-    print(f"Found {len(data_rows)} prompt tasks")
+    if headers is None:
+        print("Error: Empty worksheet")
+        wb.close()
+        return
 
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
 
     if split_by_category:
-        # Group by category
-        category_data = defaultdict(list)
+        category_idx = headers.index('category') if 'category' in headers else None
 
-        for row in data_rows:
-            row_dict = dict(zip(headers, row))
-            category = row_dict.get('category', 'unknown').lower()
-            category_data[category].append(row_dict)
+        # One open CSV writer per category, created on first use
+        writers = {}
+        task_counts = defaultdict(int)
 
-        # Write separate CSV per category
-        for category, cat_rows in category_data.items():
-            output_file = os.path.join(output_dir, f'{category}_prompts_hierarchical.csv')
+        with ExitStack() as stack:
+            for row in rows:
+                category = row[category_idx] if category_idx is not None else 'unknown'
+                category = category.lower()
+
+                writer = writers.get(category)
+                if writer is None:
+                    output_file = os.path.join(output_dir, f'{category}_prompts_hierarchical.csv')
+                    f = stack.enter_context(open(output_file, 'w', newline='', encoding='utf-8'))
+                    writer = csv.writer(f)
+                    writer.writerow(headers)
+                    writers[category] = writer
 
-            with open(output_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=headers)
-                writer.writeheader()
-                writer.writerows(cat_rows)
+                writer.writerow(row)
+                task_counts[category] += 1
 
-            print(f"  Created: {output_file} ({len(cat_rows)} tasks)")
+        print(f"Found {sum(task_counts.values())} prompt tasks")
+
+        for category, count in task_counts.items():
+            output_file = os.path.join(output_dir, f'{category}_prompts_hierarchical.csv')
+            print(f"  Created: {output_file} ({count} tasks)")
 
     else:
         # Write single CSV with all data
         output_file = os.path.join(output_dir, 'all_prompts_hierarchical.csv')
+        task_count = 0
 
         with open(output_file, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
             writer.writerow(headers)
-            writer.writerows(data_rows)
 
-        print(f"  Created: {output_file} ({len(data_rows)} tasks)")
+            for row in rows:
+                writer.writerow(row)
+                task_count += 1
+
+        print(f"Found {task_count} prompt tasks")
+        print(f"  Created: {output_file} ({task_count} tasks)")
 
     wb.close()
     print("Conversion complete!")
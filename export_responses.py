@@ -4,28 +4,86 @@ Export Inference Responses to Readable Formats
 """
 
 import argparse
-import json
 import csv
 import os
+from array import array
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List
 from collections import defaultdict
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+
+SEPARATOR = "=" * 80
+
+# Per-response text file: metadata header followed by the raw output
+RESPONSE_FILE_TEMPLATE = (
+    f"{SEPARATOR}\n"
+    "Question ID: {question_id}\n"
+    "Model: {model_id}\n"
+    "Category: {category}\n"
+    "Prompt Level: {level}\n"
+    "Prompt Tokens: {prompt_tokens}\n"
+    "Output Tokens: {completion_tokens}\n"
+    "Latency: {latency_ms:.2f} ms\n"
+    "Energy: {energy_joule:.4f} J\n"
+    f"{SEPARATOR}\n\n"
+    "{output_text}\n"
+)
+
+# Per-level section of the markdown comparison
+LEVEL_COMPARISON_TEMPLATE = (
+    "### {level}\n\n"
+    "**Metrics:**\n"
+    "- Prompt Tokens: {prompt_tokens}\n"
+    "- Output Tokens: {completion_tokens}\n"
+    "- Latency: {latency_ms:.2f} ms\n"
+    "- Energy: {energy_joule:.4f} J\n\n"
+    "**Response:**\n\n"
+    "```\n{output_text}\n```\n\n"
+    "---\n\n"
+)
+
+# Per-level block of the summary report
+LEVEL_SUMMARY_TEMPLATE = (
+    "  {level}:\n"
+    "    Count: {count}\n"
+    "    Avg Prompt Tokens: {avg_prompt_tokens:.1f}\n"
+    "    Avg Output Tokens: {avg_output_tokens:.1f}\n"
+    "    Avg Latency: {avg_latency:.2f} ms\n"
+    "    Avg Energy: {avg_energy:.4f} J\n"
+    "\n"
+)
+
+# C-level sort keys (avoid a Python lambda call per comparison)
+_model_qid_level = itemgetter('model_id', 'question_id', 'level')
+_model_id = itemgetter('model_id')
+
+
+def iter_inference_results(jsonl_file: str) -> Iterator[Dict]:
+    """Yield inference results from JSONL one record at a time."""
+    # Read raw bytes: orjson parses UTF-8 bytes directly
+    with open(jsonl_file, 'rb') as f:
+        for line in f:
+            if not line.isspace():
+                yield json_loads(line)
+
 
 def load_inference_results(jsonl_file: str) -> List[Dict]:
     """Load inference results from JSONL."""
-    results = []
-
-    with open(jsonl_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                results.append(json.loads(line))
+    results = list(iter_inference_results(jsonl_file))
 
     print(f"Loaded {len(results)} inference results")
     return results
 
 
-def export_to_csv(results: List[Dict], output_file: str):
+def export_to_csv(results: Iterable[Dict], output_file: str):
     """
     Export all responses to a CSV file.
 
@@ -39,6 +97,8 @@ def export_to_csv(results: List[Dict], output_file: str):
     - latency_ms
     - energy_joule
     - output_text (完整的response)
+
+    Rows are written in input order; main() sorts by (model_id, question_id, level).
     """
     print(f"\nExporting to CSV: {output_file}")
 
@@ -58,24 +118,32 @@ def export_to_csv(results: List[Dict], output_file: str):
             'output_text'
         ])
 
-        # Data rows
-        for result in sorted(results, key=lambda x: (x['model_id'], x['question_id'], x['level'])):
-            writer.writerow([
-                result['question_id'],
-                result['model_id'],
-                result['category'],
-                result['level'],
-                result['prompt_tokens'],
-                result['completion_tokens'],
-                round(result['latency_ms'], 2),
-                round(result['energy_joule'], 4),
-                result['output_text']
-            ])
+        # Data rows, streamed straight into the C writer; the generator
+        # counts the rows as it yields them
+        row_count = 0
 
-    print(f"  ✓ Saved {len(results)} responses to CSV")
+        def rows():
+            nonlocal row_count
+            for result in results:
+                row_count += 1
+                yield (
+                    result['question_id'],
+                    result['model_id'],
+                    result['category'],
+                    result['level'],
+                    result['prompt_tokens'],
+                    result['completion_tokens'],
+                    round(result['latency_ms'], 2),
+                    round(result['energy_joule'], 4),
+                    result['output_text']
+                )
 
+        writer.writerows(rows())
 
-def export_to_text_files(results: List[Dict], output_dir: str):
+    print(f"  ✓ Saved {row_count} responses to CSV")
+
+
+def export_to_text_files(results: Iterable[Dict], output_dir: str):
     """
     Export responses to individual text files organized by model and question.
 
@@ -94,46 +162,33 @@ def export_to_text_files(results: List[Dict], output_dir: str):
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
 
-    # Organize by model
-    by_model = defaultdict(list)
-    for result in results:
-        by_model[result['model_id']].append(result)
+    model_files = defaultdict(int)
 
-    total_files = 0
-
-    for model_id, model_results in sorted(by_model.items()):
-        # Create model directory
+    for result in results:
+        model_id = result['model_id']
         model_dir = os.path.join(output_dir, model_id)
-        os.makedirs(model_dir, exist_ok=True)
 
-        for result in sorted(model_results, key=lambda x: (x['question_id'], x['level'])):
-            # Create filename: Q{id}_{level}.txt
-            filename = f"Q{result['question_id']:03d}_{result['level']}.txt"
-            filepath = os.path.join(model_dir, filename)
+        # Create model directory on first use
+        if model_id not in model_files:
+            os.makedirs(model_dir, exist_ok=True)
 
-            # Write response with metadata
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"=" * 80 + "\n")
-                f.write(f"Question ID: {result['question_id']}\n")
-                f.write(f"Model: {result['model_id']}\n")
-                f.write(f"Category: {result['category']}\n")
-                f.write(f"Prompt Level: {result['level']}\n")
-                f.write(f"Prompt Tokens: {result['prompt_tokens']}\n")
-                f.write(f"Output Tokens: {result['completion_tokens']}\n")
-                f.write(f"Latency: {result['latency_ms']:.2f} ms\n")
-                f.write(f"Energy: {result['energy_joule']:.4f} J\n")
-                f.write(f"=" * 80 + "\n\n")
-                f.write(result['output_text'])
-                f.write("\n")
+        # Create filename: Q{id}_{level}.txt
+        filename = f"Q{result['question_id']:03d}_{result['level']}.txt"
+        filepath = os.path.join(model_dir, filename)
 
-            total_files += 1
+        # Write response with metadata in a single call
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(RESPONSE_FILE_TEMPLATE.format_map(result))
 
-        print(f"  ✓ {model_id}: {len(model_results)} files")
+        model_files[model_id] += 1
 
-    print(f"  ✓ Total: {total_files} text files created")
+    for model_id in sorted(model_files.keys()):
+        print(f"  ✓ {model_id}: {model_files[model_id]} files")
 
+    print(f"  ✓ Total: {sum(model_files.values())} text files created")
 
-def export_comparison_markdown(results: List[Dict], output_file: str, question_id: int):
+
+def export_comparison_markdown(results: Iterable[Dict], output_file: str, question_id: int):
     """
     Export side-by-side comparison for a specific question in Markdown format.
 
@@ -142,97 +197,99 @@ def export_comparison_markdown(results: List[Dict], output_file: str, question_i
     print(f"\nExporting comparison for Q{question_id}: {output_file}")
 
     # Filter results for this question
-    question_results = [r for r in results if r['question_id'] == question_id]
+    question_results = sorted(
+        (r for r in results if r['question_id'] == question_id),
+        key=_model_qid_level
+    )
 
     if not question_results:
         print(f"  ✗ No results found for question {question_id}")
         return
 
-    # Organize by model and level
-    by_model = defaultdict(dict)
-    for result in question_results:
-        by_model[result['model_id']][result['level']] = result
+    model_count = 0
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"# Question {question_id} - Comparison Across Prompt Levels\n\n")
+    # Assemble the whole document, then write it in one call
+    parts = [f"# Question {question_id} - Comparison Across Prompt Levels\n\n"]
 
-        for model_id in sorted(by_model.keys()):
-            f.write(f"## Model: {model_id}\n\n")
+    for model_id, model_results in groupby(question_results, key=_model_id):
+        parts.append(f"## Model: {model_id}\n\n")
+        model_count += 1
 
-            levels = ['L0', 'L1', 'L2', 'L3', 'P']
+        by_level = {result['level']: result for result in model_results}
+        levels = ['L0', 'L1', 'L2', 'L3', 'P']
 
-            for level in levels:
-                if level not in by_model[model_id]:
-                    continue
+        for level in levels:
+            if level in by_level:
+                parts.append(LEVEL_COMPARISON_TEMPLATE.format_map(by_level[level]))
 
-                result = by_model[model_id][level]
-
-                f.write(f"### {level}\n\n")
-                f.write(f"**Metrics:**\n")
-                f.write(f"- Prompt Tokens: {result['prompt_tokens']}\n")
-                f.write(f"- Output Tokens: {result['completion_tokens']}\n")
-                f.write(f"- Latency: {result['latency_ms']:.2f} ms\n")
-                f.write(f"- Energy: {result['energy_joule']:.4f} J\n\n")
-                f.write(f"**Response:**\n\n")
-                f.write(f"```\n{result['output_text']}\n```\n\n")
-                f.write("---\n\n")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(''.join(parts))
 
-    print(f"  ✓ Comparison saved for {len(by_model)} model(s)")
+    print(f"  ✓ Comparison saved for {model_count} model(s)")
 
 
-def create_summary_report(results: List[Dict], output_file: str):
+def create_summary_report(results: Iterable[Dict], output_file: str):
     """
     Create a summary report with statistics.
     """
     print(f"\nCreating summary report: {output_file}")
 
-    # Organize by model
-    by_model = defaultdict(list)
+    # Bucketize in one pass: (model_id, level) -> running sums of
+    # [count, latency_ms, energy_joule, prompt_tokens, completion_tokens]
+    acc = {}
+
     for result in results:
-        by_model[result['model_id']].append(result)
+        key = (result['model_id'], result['level'])
+        a = acc.get(key)
+        if a is None:
+            a = acc[key] = array('d', [0.0] * 5)
+        a[0] += 1
+        a[1] += result['latency_ms']
+        a[2] += result['energy_joule']
+        a[3] += result['prompt_tokens']
+        a[4] += result['completion_tokens']
+
+    model_counts = defaultdict(int)
+    for (model_id, _), a in acc.items():
+        model_counts[model_id] += int(a[0])
+
+    # Assemble the whole report, then write it in one call
+    parts = [
+        f"{SEPARATOR}\n",
+        "INFERENCE RESULTS SUMMARY\n",
+        f"{SEPARATOR}\n\n",
+        f"Total Inferences: {sum(model_counts.values())}\n",
+        f"Models Tested: {len(model_counts)}\n\n"
+    ]
+
+    for model_id in sorted(model_counts.keys()):
+        parts.append(
+            f"\n{SEPARATOR}\n"
+            f"Model: {model_id}\n"
+            f"{SEPARATOR}\n\n"
+            f"Total Inferences: {model_counts[model_id]}\n\n"
+            "Statistics by Prompt Level:\n\n"
+        )
+
+        # Statistics by level
+        for level in ['L0', 'L1', 'L2', 'L3', 'P']:
+            a = acc.get((model_id, level))
+            if a is None:
+                continue
+
+            count = a[0]
+
+            parts.append(LEVEL_SUMMARY_TEMPLATE.format(
+                level=level,
+                count=int(count),
+                avg_prompt_tokens=a[3] / count,
+                avg_output_tokens=a[4] / count,
+                avg_latency=a[1] / count,
+                avg_energy=a[2] / count
+            ))
 
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("=" * 80 + "\n")
-        f.write("INFERENCE RESULTS SUMMARY\n")
-        f.write("=" * 80 + "\n\n")
-
-        f.write(f"Total Inferences: {len(results)}\n")
-        f.write(f"Models Tested: {len(by_model)}\n\n")
-
-        for model_id in sorted(by_model.keys()):
-            model_results = by_model[model_id]
-
-            f.write(f"\n{'=' * 80}\n")
-            f.write(f"Model: {model_id}\n")
-            f.write(f"{'=' * 80}\n\n")
-
-            f.write(f"Total Inferences: {len(model_results)}\n\n")
-
-            # Statistics by level
-            by_level = defaultdict(list)
-            for result in model_results:
-                by_level[result['level']].append(result)
-
-            f.write("Statistics by Prompt Level:\n\n")
-
-            for level in ['L0', 'L1', 'L2', 'L3', 'P']:
-                if level not in by_level:
-                    continue
-
-                level_results = by_level[level]
-
-                avg_latency = sum(r['latency_ms'] for r in level_results) / len(level_results)
-                avg_energy = sum(r['energy_joule'] for r in level_results) / len(level_results)
-                avg_prompt_tokens = sum(r['prompt_tokens'] for r in level_results) / len(level_results)
-                avg_output_tokens = sum(r['completion_tokens'] for r in level_results) / len(level_results)
-
-                f.write(f"  {level}:\n")
-                f.write(f"    Count: {len(level_results)}\n")
-                f.write(f"    Avg Prompt Tokens: {avg_prompt_tokens:.1f}\n")
-                f.write(f"    Avg Output Tokens: {avg_output_tokens:.1f}\n")
-                f.write(f"    Avg Latency: {avg_latency:.2f} ms\n")
-                f.write(f"    Avg Energy: {avg_energy:.4f} J\n")
-                f.write(f"\n")
+        f.write(''.join(parts))
 
     print(f"  ✓ Summary report created")
 
@@ -285,6 +342,19 @@ def main():
         help='Export all formats'
     )
 
+    parser.add_argument(
+        '--streaming',
+        action='store_true',
+        help='Stream results from the JSONL instead of loading them all '
+             '(low memory; CSV rows keep file order)'
+    )
+
+    parser.add_argument(
+        '--verbose',
+        action='store_true',
+        help='List the exported files after export'
+    )
+
     args = parser.parse_args()
 
     # Load results
@@ -292,7 +362,16 @@ def main():
     print("LOADING INFERENCE RESULTS")
     print("=" * 80)
 
-    results = load_inference_results(args.runs)
+    if args.streaming:
+        # Each exporter re-reads the JSONL, so only one record is held at a time
+        print(f"Streaming inference results from {args.runs}")
+        get_results = partial(iter_inference_results, args.runs)
+    else:
+        results = load_inference_results(args.runs)
+
+        # Sort once; every exporter below consumes results in this order
+        results.sort(key=_model_qid_level)
+        get_results = partial(iter, results)
 
     # Create output directory
     os.makedirs(args.outdir, exist_ok=True)
@@ -304,42 +383,49 @@ def main():
     # Export based on options
     if args.all or args.csv:
         csv_file = os.path.join(args.outdir, 'all_responses.csv')
-        export_to_csv(results, csv_file)
+        export_to_csv(get_results(), csv_file)
 
     if args.all or args.txt:
         txt_dir = os.path.join(args.outdir, 'responses_by_model')
-        export_to_text_files(results, txt_dir)
+        export_to_text_files(get_results(), txt_dir)
 
     if args.all or args.summary:
         summary_file = os.path.join(args.outdir, 'summary_report.txt')
-        create_summary_report(results, summary_file)
+        create_summary_report(get_results(), summary_file)
 
     if args.compare:
         compare_file = os.path.join(args.outdir, f'comparison_Q{args.compare:03d}.md')
-        export_comparison_markdown(results, compare_file, args.compare)
+        export_comparison_markdown(get_results(), compare_file, args.compare)
 
     # If no options specified, export all
     if not any([args.csv, args.txt, args.summary, args.compare, args.all]):
         print("\nNo export format specified, exporting all formats...")
 
         csv_file = os.path.join(args.outdir, 'all_responses.csv')
-        export_to_csv(results, csv_file)
+        export_to_csv(get_results(), csv_file)
 
         txt_dir = os.path.join(args.outdir, 'responses_by_model')
-        export_to_text_files(results, txt_dir)
+        export_to_text_files(get_results(), txt_dir)
 
         summary_file = os.path.join(args.outdir, 'summary_report.txt')
-        create_summary_report(results, summary_file)
+        create_summary_report(get_results(), summary_file)
 
     print("\n" + "=" * 80)
     print("EXPORT COMPLETE")
     print("=" * 80)
     print(f"\nOutput saved to: {args.outdir}/")
+
+    # Walking the tree stats every exported file, so only do it on request
+    if not args.verbose:
+        return
+
     print("\nFiles created:")
-    for root, dirs, files in os.walk(args.outdir):
-        level = root.replace(args.outdir, '').count(os.sep)
+    out_root = Path(args.outdir)
+    for root, dirs, files in os.walk(out_root):
+        root = Path(root)
+        level = len(root.relative_to(out_root).parts)
         indent = ' ' * 2 * level
-        print(f"{indent}{os.path.basename(root)}/")
+        print(f"{indent}{root.name}/")
         subindent = ' ' * 2 * (level + 1)
         for file in sorted(files)[:5]:  # Show first 5 files
             print(f"{subindent}{file}")
@@ -4,182 +4,303 @@ Generates hierarchical prompts (L0, L1, L2, L3, P) from question.jsonl
 and exports to Excel with prompt and token count sheets.
 """
 
-import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain
 import tiktoken
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
-from typing import Dict, List, Tuple
+import xlsxwriter
+from typing import Dict, Iterable, Iterator, List, Tuple
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
-class PromptGenerator:
-    def __init__(self, model_name="gpt-4"):
-        """Initialize with tiktoken encoder for accurate token counting."""
-        try:
-            self.encoder = tiktoken.encoding_for_model(model_name)
-        except:
-            self.encoder = tiktoken.get_encoding("cl100k_base")
 
-    def count_tokens(self, text: str) -> int:
-        """Count tokens in text using tiktoken."""
-        return len(self.encoder.encode(text))
+# Cell format properties, registered once per workbook
+HEADER_FORMAT = {'bold': True, 'align': 'center', 'valign': 'vcenter'}
+WRAP_FORMAT = {'text_wrap': True, 'valign': 'top'}
 
-    def generate_l0(self, question: str) -> str:
-        """L0: Base Prompt - The original task instruction."""
-        return question
 
-    def generate_l1(self, l0: str, category: str) -> str:
-        """L1: Clarified Prompt - Adds clarity, scoring dimensions, basic constraints."""
+# L1: category-specific enhancements, keyed by lowercase category
+L1_ENHANCEMENTS = {
+    "writing": "\n\nPlease ensure your response includes:\n- A clear introduction, body, and conclusion\n- Coherent structure and logical flow\n- Appropriate tone and style for the context\n- Proper grammar and punctuation",
 
-        # Category-specific enhancements
-        enhancements = {
-            "writing": "\n\nPlease ensure your response includes:\n- A clear introduction, body, and conclusion\n- Coherent structure and logical flow\n- Appropriate tone and style for the context\n- Proper grammar and punctuation",
+    "roleplay": "\n\nPlease ensure your response:\n- Stays in character throughout\n- Uses appropriate tone and mannerisms\n- Demonstrates understanding of the character's background and motivations\n- Maintains consistency with the character's known personality traits",
 
-            "roleplay": "\n\nPlease ensure your response:\n- Stays in character throughout\n- Uses appropriate tone and mannerisms\n- Demonstrates understanding of the character's background and motivations\n- Maintains consistency with the character's known personality traits",
+    "reasoning": "\n\nPlease ensure your response:\n- Clearly explains the logical reasoning process\n- Identifies key assumptions and constraints\n- Shows step-by-step deduction\n- Arrives at a well-justified conclusion",
 
-            "reasoning": "\n\nPlease ensure your response:\n- Clearly explains the logical reasoning process\n- Identifies key assumptions and constraints\n- Shows step-by-step deduction\n- Arrives at a well-justified conclusion",
+    "math": "\n\nPlease ensure your response:\n- Shows all calculation steps clearly\n- Explains the mathematical reasoning\n- Provides the final answer in the appropriate format\n- Verifies the solution makes sense in context",
 
-            "math": "\n\nPlease ensure your response:\n- Shows all calculation steps clearly\n- Explains the mathematical reasoning\n- Provides the final answer in the appropriate format\n- Verifies the solution makes sense in context",
+    "coding": "\n\nPlease ensure your response:\n- Includes clean, well-commented code\n- Follows best practices and coding standards\n- Handles edge cases appropriately\n- Provides explanation of the approach used",
 
-            "coding": "\n\nPlease ensure your response:\n- Includes clean, well-commented code\n- Follows best practices and coding standards\n- Handles edge cases appropriately\n- Provides explanation of the approach used",
+    "extraction": "\n\nPlease ensure your response:\n- Accurately extracts all requested information\n- Follows the specified output format precisely\n- Organizes data in a clear and structured manner\n- Maintains consistency in formatting",
 
-            "extraction": "\n\nPlease ensure your response:\n- Accurately extracts all requested information\n- Follows the specified output format precisely\n- Organizes data in a clear and structured manner\n- Maintains consistency in formatting",
+    "stem": "\n\nPlease ensure your response:\n- Uses accurate scientific terminology\n- Explains concepts clearly and thoroughly\n- Provides relevant examples or applications\n- Cites fundamental principles where appropriate",
 
-            "stem": "\n\nPlease ensure your response:\n- Uses accurate scientific terminology\n- Explains concepts clearly and thoroughly\n- Provides relevant examples or applications\n- Cites fundamental principles where appropriate",
+    "humanities": "\n\nPlease ensure your response:\n- Demonstrates depth of understanding\n- Considers multiple perspectives where relevant\n- Supports arguments with evidence or examples\n- Maintains academic rigor and clarity"
+}
 
-            "humanities": "\n\nPlease ensure your response:\n- Demonstrates depth of understanding\n- Considers multiple perspectives where relevant\n- Supports arguments with evidence or examples\n- Maintains academic rigor and clarity"
-        }
+DEFAULT_L1_ENHANCEMENT = "\n\nPlease ensure your response is clear, well-structured, and addresses all aspects of the question."
 
-        enhancement = enhancements.get(category.lower(), "\n\nPlease ensure your response is clear, well-structured, and addresses all aspects of the question.")
 
-        return l0 + enhancement
+# L2: category-specific step-by-step guidance, keyed by lowercase category
+L2_GUIDANCE = {
+    "writing": "\n\nFollow this structured approach:\nStep 1: Plan your content - Outline the main points and supporting details\nStep 2: Craft the introduction - Hook the reader and present your thesis\nStep 3: Develop the body - Elaborate on each main point with evidence and examples\nStep 4: Write the conclusion - Summarize key points and provide closure\nStep 5: Review and refine - Check for coherence, clarity, and correctness",
 
-    def generate_l2(self, l1: str, category: str) -> str:
-        """L2: Guided Prompt - Adds step-by-step execution instructions."""
+    "roleplay": "\n\nFollow this roleplay framework:\nStep 1: Establish the character's mindset - Consider their current situation and emotional state\nStep 2: Respond authentically - Use language and expressions characteristic of the character\nStep 3: Incorporate character knowledge - Reference relevant background information naturally\nStep 4: Maintain consistency - Ensure actions and statements align with character traits\nStep 5: Engage meaningfully - Address the situation while staying true to character",
 
-        # Category-specific step-by-step guidance
-        guidance = {
-            "writing": "\n\nFollow this structured approach:\nStep 1: Plan your content - Outline the main points and supporting details\nStep 2: Craft the introduction - Hook the reader and present your thesis\nStep 3: Develop the body - Elaborate on each main point with evidence and examples\nStep 4: Write the conclusion - Summarize key points and provide closure\nStep 5: Review and refine - Check for coherence, clarity, and correctness",
+    "reasoning": "\n\nFollow this logical reasoning process:\nStep 1: Identify the problem - Clearly state what needs to be determined\nStep 2: Gather relevant information - List all given facts and constraints\nStep 3: Analyze relationships - Examine how different elements connect\nStep 4: Apply logical deduction - Work through the reasoning systematically\nStep 5: Validate the conclusion - Verify the answer against the original problem",
 
-            "roleplay": "\n\nFollow this roleplay framework:\nStep 1: Establish the character's mindset - Consider their current situation and emotional state\nStep 2: Respond authentically - Use language and expressions characteristic of the character\nStep 3: Incorporate character knowledge - Reference relevant background information naturally\nStep 4: Maintain consistency - Ensure actions and statements align with character traits\nStep 5: Engage meaningfully - Address the situation while staying true to character",
+    "math": "\n\nFollow this problem-solving approach:\nStep 1: Understand the problem - Identify what is being asked and what is given\nStep 2: Plan the solution - Determine which mathematical concepts and formulas to use\nStep 3: Execute calculations - Work through the math step-by-step\nStep 4: Interpret results - Translate mathematical answer to the context\nStep 5: Verify solution - Check if the answer is reasonable and accurate",
 
-            "reasoning": "\n\nFollow this logical reasoning process:\nStep 1: Identify the problem - Clearly state what needs to be determined\nStep 2: Gather relevant information - List all given facts and constraints\nStep 3: Analyze relationships - Examine how different elements connect\nStep 4: Apply logical deduction - Work through the reasoning systematically\nStep 5: Validate the conclusion - Verify the answer against the original problem",
+    "coding": "\n\nFollow this development workflow:\nStep 1: Understand requirements - Clarify what the code needs to accomplish\nStep 2: Design the solution - Plan the algorithm and data structures\nStep 3: Implement the code - Write clean, modular code with appropriate comments\nStep 4: Test edge cases - Verify the code handles various scenarios correctly\nStep 5: Optimize if needed - Review for efficiency and readability improvements",
 
-            "math": "\n\nFollow this problem-solving approach:\nStep 1: Understand the problem - Identify what is being asked and what is given\nStep 2: Plan the solution - Determine which mathematical concepts and formulas to use\nStep 3: Execute calculations - Work through the math step-by-step\nStep 4: Interpret results - Translate mathematical answer to the context\nStep 5: Verify solution - Check if the answer is reasonable and accurate",
+    "extraction": "\n\nFollow this extraction process:\nStep 1: Read carefully - Review the source material thoroughly\nStep 2: Identify target information - Locate all instances of requested data\nStep 3: Extract systematically - Gather each piece of information accurately\nStep 4: Format appropriately - Organize data according to specified structure\nStep 5: Verify completeness - Ensure all required information is included",
 
-            "coding": "\n\nFollow this development workflow:\nStep 1: Understand requirements - Clarify what the code needs to accomplish\nStep 2: Design the solution - Plan the algorithm and data structures\nStep 3: Implement the code - Write clean, modular code with appropriate comments\nStep 4: Test edge cases - Verify the code handles various scenarios correctly\nStep 5: Optimize if needed - Review for efficiency and readability improvements",
+    "stem": "\n\nFollow this explanatory framework:\nStep 1: Define key terms - Explain relevant scientific concepts and terminology\nStep 2: Present core principles - Describe the fundamental laws or theories involved\nStep 3: Explain mechanisms - Detail how processes or phenomena occur\nStep 4: Provide examples - Illustrate with concrete instances or applications\nStep 5: Synthesize understanding - Connect concepts to the broader context",
 
-            "extraction": "\n\nFollow this extraction process:\nStep 1: Read carefully - Review the source material thoroughly\nStep 2: Identify target information - Locate all instances of requested data\nStep 3: Extract systematically - Gather each piece of information accurately\nStep 4: Format appropriately - Organize data according to specified structure\nStep 5: Verify completeness - Ensure all required information is included",
+    "humanities": "\n\nFollow this analytical approach:\nStep 1: Establish context - Provide relevant background information\nStep 2: Present main arguments - Articulate key positions or perspectives\nStep 3: Support with evidence - Use examples, data, or authoritative sources\nStep 4: Address counterpoints - Consider alternative viewpoints where appropriate\nStep 5: Draw conclusions - Synthesize insights and implications"
+}
 
-            "stem": "\n\nFollow this explanatory framework:\nStep 1: Define key terms - Explain relevant scientific concepts and terminology\nStep 2: Present core principles - Describe the fundamental laws or theories involved\nStep 3: Explain mechanisms - Detail how processes or phenomena occur\nStep 4: Provide examples - Illustrate with concrete instances or applications\nStep 5: Synthesize understanding - Connect concepts to the broader context",
+DEFAULT_L2_GUIDANCE = "\n\nFollow this systematic approach:\nStep 1: Analyze the question thoroughly\nStep 2: Organize your thoughts and main points\nStep 3: Develop your response systematically\nStep 4: Ensure all requirements are addressed\nStep 5: Review for completeness and accuracy"
 
-            "humanities": "\n\nFollow this analytical approach:\nStep 1: Establish context - Provide relevant background information\nStep 2: Present main arguments - Articulate key positions or perspectives\nStep 3: Support with evidence - Use examples, data, or authoritative sources\nStep 4: Address counterpoints - Consider alternative viewpoints where appropriate\nStep 5: Draw conclusions - Synthesize insights and implications"
-        }
 
-        step_guidance = guidance.get(category.lower(), "\n\nFollow this systematic approach:\nStep 1: Analyze the question thoroughly\nStep 2: Organize your thoughts and main points\nStep 3: Develop your response systematically\nStep 4: Ensure all requirements are addressed\nStep 5: Review for completeness and accuracy")
+# L3: category-specific examples and stylistic guidance, keyed by lowercase category
+L3_EXAMPLES = {
+    "writing": "\n\nExample of effective structure:\nIntroduction: \"Literature serves as a mirror to society, reflecting both our greatest achievements and deepest struggles. Through the written word, we gain insights that transcend time and culture.\"\nBody: Develop each point with specific examples and thoughtful analysis, maintaining a consistent voice.\nConclusion: Synthesize the main ideas while leaving the reader with a lasting impression.\n\nStylistic expectations: Use varied sentence structure, incorporate transitions smoothly, and maintain an engaging yet appropriate tone throughout.",
 
-        return l1 + step_guidance
+    "roleplay": "\n\nExample of staying in character:\nIf roleplaying Sherlock Holmes: \"Elementary, my dear Watson. The mud on the suspect's shoes indicates a recent visit to the botanical gardens - note the distinctive reddish clay found only in that location. Combined with the pollen samples, we can deduce...\"\n\nStylistic expectations: Mirror the character's speech patterns, incorporate their typical mannerisms, reference their background knowledge naturally, and maintain their characteristic perspective throughout the interaction.",
 
-    def generate_l3(self, l2: str, category: str) -> str:
-        """L3: Few-Shot/Example-Guided Prompt - Adds examples and stylistic expectations."""
+    "reasoning": "\n\nExample of clear logical reasoning:\n\"Let's examine this systematically. We know that A is true, and we know that if A is true, then B must also be true. Therefore, B is true. Now, given that B is true and C is false, we can deduce that D cannot be the case because...\"\n\nStylistic expectations: Make your reasoning explicit and transparent. Use clear logical connectors (\"therefore,\" \"because,\" \"given that\") and ensure each step follows necessarily from the previous ones.",
 
-        # Category-specific examples and stylistic guidance
-        examples = {
-            "writing": "\n\nExample of effective structure:\nIntroduction: \"Literature serves as a mirror to society, reflecting both our greatest achievements and deepest struggles. Through the written word, we gain insights that transcend time and culture.\"\nBody: Develop each point with specific examples and thoughtful analysis, maintaining a consistent voice.\nConclusion: Synthesize the main ideas while leaving the reader with a lasting impression.\n\nStylistic expectations: Use varied sentence structure, incorporate transitions smoothly, and maintain an engaging yet appropriate tone throughout.",
+    "math": "\n\nExample of clear mathematical reasoning:\n\"Given: The area of a rectangle is 48 square meters, and its length is 8 meters.\nSolution: Using the formula Area = length × width\n48 = 8 × width\nwidth = 48 ÷ 8 = 6 meters\nTherefore, the width is 6 meters.\"\n\nStylistic expectations: Show all work, label steps clearly, use proper mathematical notation, and explain the reasoning behind each operation.",
 
-            "roleplay": "\n\nExample of staying in character:\nIf roleplaying Sherlock Holmes: \"Elementary, my dear Watson. The mud on the suspect's shoes indicates a recent visit to the botanical gardens - note the distinctive reddish clay found only in that location. Combined with the pollen samples, we can deduce...\"\n\nStylistic expectations: Mirror the character's speech patterns, incorporate their typical mannerisms, reference their background knowledge naturally, and maintain their characteristic perspective throughout the interaction.",
+    "coding": "\n\nExample of well-structured code:\n```python\ndef find_max(numbers):\n    \"\"\"Find the maximum value in a list of numbers.\n    \n    Args:\n        numbers: List of numeric values\n    Returns:\n        The maximum value, or None if list is empty\n    \"\"\"\n    if not numbers:\n        return None\n    return max(numbers)\n```\n\nStylistic expectations: Include docstrings, use descriptive variable names, handle edge cases, write modular functions, and add comments for complex logic.",
 
-            "reasoning": "\n\nExample of clear logical reasoning:\n\"Let's examine this systematically. We know that A is true, and we know that if A is true, then B must also be true. Therefore, B is true. Now, given that B is true and C is false, we can deduce that D cannot be the case because...\"\n\nStylistic expectations: Make your reasoning explicit and transparent. Use clear logical connectors (\"therefore,\" \"because,\" \"given that\") and ensure each step follows necessarily from the previous ones.",
+    "extraction": "\n\nExample of proper extraction format:\nIf extracting from: \"John Smith, CEO of TechCorp, announced in New York...\"\nOutput: {\"person\": \"John Smith\", \"title\": \"CEO\", \"organization\": \"TechCorp\", \"location\": \"New York\"}\n\nStylistic expectations: Maintain consistent formatting, preserve exact values from source material, organize data logically, and ensure output is machine-readable if JSON/CSV format is required.",
 
-            "math": "\n\nExample of clear mathematical reasoning:\n\"Given: The area of a rectangle is 48 square meters, and its length is 8 meters.\nSolution: Using the formula Area = length × width\n48 = 8 × width\nwidth = 48 ÷ 8 = 6 meters\nTherefore, the width is 6 meters.\"\n\nStylistic expectations: Show all work, label steps clearly, use proper mathematical notation, and explain the reasoning behind each operation.",
+    "stem": "\n\nExample of clear scientific explanation:\n\"Photosynthesis occurs in two main stages. In the light-dependent reactions, which take place in the thylakoid membranes, chlorophyll absorbs light energy to produce ATP and NADPH. These energy carriers are then used in the light-independent reactions (Calvin cycle) in the stroma to convert CO₂ into glucose.\"\n\nStylistic expectations: Use precise scientific terminology, explain processes mechanistically, connect concepts to real-world applications, and maintain accuracy while ensuring clarity.",
 
-            "coding": "\n\nExample of well-structured code:\n```python\ndef find_max(numbers):\n    \"\"\"Find the maximum value in a list of numbers.\n    \n    Args:\n        numbers: List of numeric values\n    Returns:\n        The maximum value, or None if list is empty\n    \"\"\"\n    if not numbers:\n        return None\n    return max(numbers)\n```\n\nStylistic expectations: Include docstrings, use descriptive variable names, handle edge cases, write modular functions, and add comments for complex logic.",
+    "humanities": "\n\nExample of analytical writing:\n\"The Renaissance marked a pivotal shift in Western thought. For instance, the emergence of humanism challenged medieval scholasticism by emphasizing individual potential and classical learning. This is evidenced by works such as Pico della Mirandola's 'Oration on the Dignity of Man,' which argued that humans possess the capacity for self-determination.\"\n\nStylistic expectations: Balance breadth and depth, support claims with specific evidence, acknowledge complexity and multiple perspectives, and maintain scholarly rigor while remaining accessible."
+}
 
-            "extraction": "\n\nExample of proper extraction format:\nIf extracting from: \"John Smith, CEO of TechCorp, announced in New York...\"\nOutput: {\"person\": \"John Smith\", \"title\": \"CEO\", \"organization\": \"TechCorp\", \"location\": \"New York\"}\n\nStylistic expectations: Maintain consistent formatting, preserve exact values from source material, organize data logically, and ensure output is machine-readable if JSON/CSV format is required.",
+DEFAULT_L3_EXAMPLE = "\n\nExample of quality response:\nProvide specific, detailed information that directly addresses the question. Use concrete examples to illustrate abstract concepts. Maintain coherence and logical flow throughout.\n\nStylistic expectations: Demonstrate thoroughness, accuracy, and clear communication. Ensure your response is well-organized and easy to follow."
 
-            "stem": "\n\nExample of clear scientific explanation:\n\"Photosynthesis occurs in two main stages. In the light-dependent reactions, which take place in the thylakoid membranes, chlorophyll absorbs light energy to produce ATP and NADPH. These energy carriers are then used in the light-independent reactions (Calvin cycle) in the stroma to convert CO₂ into glucose.\"\n\nStylistic expectations: Use precise scientific terminology, explain processes mechanistically, connect concepts to real-world applications, and maintain accuracy while ensuring clarity.",
 
-            "humanities": "\n\nExample of analytical writing:\n\"The Renaissance marked a pivotal shift in Western thought. For instance, the emergence of humanism challenged medieval scholasticism by emphasizing individual potential and classical learning. This is evidenced by works such as Pico della Mirandola's 'Oration on the Dignity of Man,' which argued that humans possess the capacity for self-determination.\"\n\nStylistic expectations: Balance breadth and depth, support claims with specific evidence, acknowledge complexity and multiple perspectives, and maintain scholarly rigor while remaining accessible."
-        }
+# P: uninformative placebo text, identical for every category
+PLACEBO_TEXT = """
+
+Please approach this task with the utmost care and attention to detail. I would greatly appreciate it if you could do your absolute best work on this request. Take all the time you need to ensure that every possible aspect is thoroughly considered and addressed with the highest level of diligence and thoughtfulness.
+
+It is of paramount importance that your response be as comprehensive, detailed, and well-considered as humanly possible. Please ensure that you explore every conceivable angle and perspective with exceptional thoroughness and meticulous precision. Your careful attention to even the smallest details will be immensely valued and appreciated.
 
-        example_guidance = examples.get(category.lower(), "\n\nExample of quality response:\nProvide specific, detailed information that directly addresses the question. Use concrete examples to illustrate abstract concepts. Maintain coherence and logical flow throughout.\n\nStylistic expectations: Demonstrate thoroughness, accuracy, and clear communication. Ensure your response is well-organized and easy to follow.")
+I have complete confidence in your abilities and trust that you will deliver an outstanding response that exemplifies the very best of your capabilities. Thank you so much in advance for your dedication and commitment to excellence in completing this task."""
 
-        return l2 + example_guidance
 
-    def generate_p(self, l3: str) -> str:
-        """P: Placebo Prompt - Adds uninformative fluff without real content."""
+def build_level_suffixes(enhancement: str, guidance: str, example: str) -> Dict[str, str]:
+    """Combine one category's suffixes into the full text each level appends to L0."""
+    l1 = enhancement
+    l2 = l1 + guidance
+    l3 = l2 + example
+    return {'L1': l1, 'L2': l2, 'L3': l3, 'P': l3 + PLACEBO_TEXT}
 
-        placebo_text = """
 
-Please approach this task with the utmost care and attention to detail. I would greatly appreciate it if you could do your absolute best work on this request. Take all the time you need to ensure that every possible aspect is thoroughly considered and addressed with the highest level of diligence and thoughtfulness.
+# Cumulative L1..P suffixes per lowercase category, built once at import
+LEVEL_SUFFIXES = {
+    category: build_level_suffixes(L1_ENHANCEMENTS[category], L2_GUIDANCE[category], L3_EXAMPLES[category])
+    for category in L1_ENHANCEMENTS
+}
 
-It is of paramount importance that your response be as comprehensive, detailed, and well-considered as humanly possible. Please ensure that you explore every conceivable angle and perspective with exceptional thoroughness and meticulous precision. Your careful attention to even the smallest details will be immensely valued and appreciated.
+DEFAULT_LEVEL_SUFFIXES = build_level_suffixes(DEFAULT_L1_ENHANCEMENT, DEFAULT_L2_GUIDANCE, DEFAULT_L3_EXAMPLE)
 
-I have complete confidence in your abilities and trust that you will deliver an outstanding response that exemplifies the very best of your capabilities. Thank you so much in advance for your dedication and commitment to excellence in completing this task."""
+# Every suffix starts with this blank-line separator followed by a letter.
+# tiktoken's pre-tokenizer always splits between a newline and a letter, so
+# tokens(base + suffix) == tokens(base + SUFFIX_SEPARATOR) + tokens(rest of suffix)
+SUFFIX_SEPARATOR = "\n\n"
 
-        return l3 + placebo_text
+
+@lru_cache(maxsize=None)
+def get_encoder(model_name: str = "gpt-4") -> tiktoken.Encoding:
+    """Load the tiktoken encoding for a model once per process (cl100k_base if unknown)."""
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+class PromptGenerator:
+    __slots__ = ('encoder', 'suffix_token_counts', 'default_suffix_token_counts')
+
+    def __init__(self, model_name="gpt-4"):
+        """Initialize with tiktoken encoder for accurate token counting."""
+        self.encoder = get_encoder(model_name)
+
+        # Count each level suffix (after its separator) once, so a question
+        # only needs its base question encoded
+        suffix_tables = [*LEVEL_SUFFIXES.values(), DEFAULT_LEVEL_SUFFIXES]
+        counts = iter(self.count_tokens_batch([
+            suffix[len(SUFFIX_SEPARATOR):]
+            for suffixes in suffix_tables
+            for suffix in suffixes.values()
+        ]))
+        self.suffix_token_counts = {
+            category: {level: next(counts) for level in suffixes}
+            for category, suffixes in LEVEL_SUFFIXES.items()
+        }
+        self.default_suffix_token_counts = {level: next(counts) for level in DEFAULT_LEVEL_SUFFIXES}
+
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for many texts in one multi-threaded tiktoken call."""
+        return [len(ids) for ids in self.encoder.encode_ordinary_batch(texts, num_threads=os.cpu_count() or 1)]
 
     def generate_all_levels(self, question_data: Dict) -> Dict[str, str]:
         """Generate all prompt levels for a single question."""
 
         # Use the first turn as the base question
         base_question = question_data['turns'][0]
-        category = question_data['category']
-
-        # Generate each level
-        l0 = self.generate_l0(base_question)
-        l1 = self.generate_l1(l0, category)
-        l2 = self.generate_l2(l1, category)
-        l3 = self.generate_l3(l2, category)
-        p = self.generate_p(l3)
+        suffixes = LEVEL_SUFFIXES.get(question_data['category'].lower(), DEFAULT_LEVEL_SUFFIXES)
 
+        # Each level is the base question plus its precomputed suffix
         return {
-            'L0': l0,
-            'L1': l1,
-            'L2': l2,
-            'L3': l3,
-            'P': p
+            'L0': base_question,
+            'L1': base_question + suffixes['L1'],
+            'L2': base_question + suffixes['L2'],
+            'L3': base_question + suffixes['L3'],
+            'P': base_question + suffixes['P']
         }
 
-    def get_token_counts(self, prompts: Dict[str, str]) -> Dict[str, int]:
-        """Calculate token counts for all prompt levels."""
-        return {
-            f'{level}_tokens': self.count_tokens(text)
-            for level, text in prompts.items()
-        }
+    def get_question_token_counts(self, questions: List[Dict]) -> List[Dict[str, int]]:
+        """Calculate token counts for all prompt levels of many questions at once.
+
+        Only the base question is encoded (alone and with SUFFIX_SEPARATOR);
+        the level counts add the precomputed suffix counts.
+        """
+        texts = []
+        for question in questions:
+            base_question = question['turns'][0]
+            texts.append(base_question)
+            texts.append(base_question + SUFFIX_SEPARATOR)
+        counts = self.count_tokens_batch(texts)
+
+        token_counts_list = []
+        for question, base_tokens, joined_tokens in zip(questions, counts[::2], counts[1::2]):
+            suffix_counts = self.suffix_token_counts.get(
+                question['category'].lower(), self.default_suffix_token_counts
+            )
+            token_counts = {'L0_tokens': base_tokens}
+            for level, suffix_tokens in suffix_counts.items():
+                token_counts[f'{level}_tokens'] = joined_tokens + suffix_tokens
+            token_counts_list.append(token_counts)
+        return token_counts_list
+
+
+# Per-process generator, created once by init_worker
+_generator = None
+
+
+def init_worker(model_name: str = "gpt-4"):
+    """Load the tokenizer once in each worker process."""
+    global _generator
+    _generator = PromptGenerator(model_name)
+
+
+def process_questions(questions: List[Dict]) -> List[Tuple]:
+    """Generate all levels for a chunk of questions and count their tokens."""
+    prompts_list = [_generator.generate_all_levels(question) for question in questions]
+    token_counts_list = _generator.get_question_token_counts(questions)
+    return list(zip(questions, prompts_list, token_counts_list))
 
 
 def read_jsonl(filepath: str) -> List[Dict]:
     """Read JSONL file and return list of question objects."""
     questions = []
-    with open(filepath, 'r', encoding='utf-8') as f:
+    with open(filepath, 'rb') as f:
         for line in f:
-            if line.strip():
-                questions.append(json.loads(line))
+            if not line.isspace():
+                questions.append(json_loads(line))
     return questions
 
 
-def create_excel_output(questions: List[Dict], prompts_data: List[Tuple], output_file: str):
-    """Create Excel workbook with two sheets: Prompts and Token Counts."""
+# Number of questions whose report lines are written to stdout at once
+REPORT_EVERY = 100
+
 
-    wb = Workbook()
+def report_token_counts(prompts_data: Iterable[Tuple], total: int) -> Iterator[Tuple]:
+    """Report each question's token counts as its result passes through.
+
+    Report lines are buffered and written every REPORT_EVERY questions
+    rather than printed one by one.
+    """
+    lines = []
+    for i, item in enumerate(prompts_data, 1):
+        question, _, token_counts = item
+        lines.append(f"Question {i}/{total} (ID: {question['question_id']})")
+
+        # Show token counts for verification
+        lines.append(f"  Tokens - L0: {token_counts['L0_tokens']}, "
+                     f"L1: {token_counts['L1_tokens']}, "
+                     f"L2: {token_counts['L2_tokens']}, "
+                     f"L3: {token_counts['L3_tokens']}, "
+                     f"P: {token_counts['P_tokens']}")
+
+        # Verify monotonic increase
+        t = token_counts
+        if not (t['L0_tokens'] <= t['L1_tokens'] <= t['L2_tokens'] <= t['L3_tokens'] <= t['P_tokens']):
+            lines.append(f"  WARNING: Token counts not monotonically increasing!")
+
+        if i % REPORT_EVERY == 0:
+            sys.stdout.write("\n".join(lines) + "\n")
+            lines.clear()
+
+        yield item
+
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+
+
+def create_excel_output(prompts_data: Iterable[Tuple], output_file: str):
+    """Create Excel workbook with two sheets: Prompts and Token Counts.
+
+    Both sheets are filled in a single pass, so prompts_data can be a
+    generator and no result needs to be kept after its rows are written.
+    """
+
+    # constant_memory streams each row to disk once it is complete
+    wb = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+    header_format = wb.add_format(HEADER_FORMAT)
+    wrap_format = wb.add_format(WRAP_FORMAT)
 
     # Sheet 1: Prompts
-    ws1 = wb.active
-    ws1.title = "Prompts"
+    ws1 = wb.add_worksheet("Prompts")
+
+    # Adjust column widths for Sheet 1; prompt columns (D through H) wrap text
+    ws1.set_column('A:A', 12)
+    ws1.set_column('B:B', 15)
+    ws1.set_column('C:C', 30)
+    ws1.set_column('D:H', 50, wrap_format)
 
     # Headers for Sheet 1
     headers1 = ['question_id', 'category', 'topic', 'L0', 'L1', 'L2', 'L3', 'P']
-    ws1.append(headers1)
+    ws1.write_row(0, 0, headers1, header_format)
 
-    # Style headers
-    for cell in ws1[1]:
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+    # Sheet 2: Token Counts
+    ws2 = wb.add_worksheet("Token Counts")
 
-    # Add data rows
-    for q, prompts in prompts_data:
+    # Adjust column widths for Sheet 2
+    ws2.set_column('A:G', 15)
+
+    # Headers for Sheet 2
+    headers2 = ['question_id', 'category', 'L0_tokens', 'L1_tokens', 'L2_tokens', 'L3_tokens', 'P_tokens']
+    ws2.write_row(0, 0, headers2, header_format)
+
+    # Add data rows to both sheets
+    for row_idx, (q, prompts, token_counts) in enumerate(prompts_data, start=1):
         # Use first turn as topic (truncated if too long)
-        topic = q['turns'][0][:50] + '...' if len(q['turns'][0]) > 50 else q['turns'][0]
+        first_turn = q['turns'][0]
+        topic = first_turn[:50] + '...' if len(first_turn) > 50 else first_turn
 
         row = [
             q['question_id'],
@@ -191,36 +312,7 @@ def create_excel_output(questions: List[Dict], prompts_data: List[Tuple], output
             prompts['L3'],
             prompts['P']
         ]
-        ws1.append(row)
-
-    # Adjust column widths for Sheet 1
-    ws1.column_dimensions['A'].width = 12
-    ws1.column_dimensions['B'].width = 15
-    ws1.column_dimensions['C'].width = 30
-    for col in ['D', 'E', 'F', 'G', 'H']:
-        ws1.column_dimensions[col].width = 50
-
-    # Enable text wrapping for prompt columns
-    for row in ws1.iter_rows(min_row=2):
-        for cell in row[3:]:  # Columns D through H (prompts)
-            cell.alignment = Alignment(wrap_text=True, vertical='top')
-
-    # Sheet 2: Token Counts
-    ws2 = wb.create_sheet("Token Counts")
-
-    # Headers for Sheet 2
-    headers2 = ['question_id', 'category', 'L0_tokens', 'L1_tokens', 'L2_tokens', 'L3_tokens', 'P_tokens']
-    ws2.append(headers2)
-
-    # Style headers
-    for cell in ws2[1]:
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-    # Add token count data
-    generator = PromptGenerator()
-    for q, prompts in prompts_data:
-        token_counts = generator.get_token_counts(prompts)
+        ws1.write_row(row_idx, 0, row)
 
         row = [
             q['question_id'],
@@ -231,14 +323,10 @@ def create_excel_output(questions: List[Dict], prompts_data: List[Tuple], output
             token_counts['L3_tokens'],
             token_counts['P_tokens']
         ]
-        ws2.append(row)
-
-    # Adjust column widths for Sheet 2
-    for col in ws2.columns:
-        ws2.column_dimensions[col[0].column_letter].width = 15
+        ws2.write_row(row_idx, 0, row)
 
     # Save workbook
-    wb.save(output_file)
+    wb.close()
     print(f"Excel file saved: {output_file}")
 
 
@@ -255,34 +343,15 @@ def main():
     questions = read_jsonl(input_file)
     print(f"Loaded {len(questions)} questions")
 
-    # Generate prompts
-    print("Generating prompts for all levels...")
-    generator = PromptGenerator()
-    prompts_data = []
-
-    for i, question in enumerate(questions, 1):
-        print(f"Processing question {i}/{len(questions)} (ID: {question['question_id']})")
-        prompts = generator.generate_all_levels(question)
-        prompts_data.append((question, prompts))
-
-        # Show token counts for verification
-        token_counts = generator.get_token_counts(prompts)
-        print(f"  Tokens - L0: {token_counts['L0_tokens']}, "
-              f"L1: {token_counts['L1_tokens']}, "
-              f"L2: {token_counts['L2_tokens']}, "
-              f"L3: {token_counts['L3_tokens']}, "
-              f"P: {token_counts['P_tokens']}")
-
-        # Verify monotonic increase
-        tokens = [token_counts['L0_tokens'], token_counts['L1_tokens'],
-                 token_counts['L2_tokens'], token_counts['L3_tokens'],
-                 token_counts['P_tokens']]
-        if tokens != sorted(tokens):
-            print(f"  WARNING: Token counts not monotonically increasing!")
-
-    # Create Excel output
-    print(f"\nCreating Excel output...")
-    create_excel_output(questions, prompts_data, output_file)
+    # Generate prompts and count tokens, one chunk of questions per task;
+    # results are written to the workbook as they arrive
+    print("Generating prompts, counting tokens and writing Excel output...")
+    workers = os.cpu_count() or 1
+    chunk_size = max(1, len(questions) // (4 * workers))
+    chunks = [questions[i:i + chunk_size] for i in range(0, len(questions), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        prompts_data = chain.from_iterable(executor.map(process_questions, chunks))
+        create_excel_output(report_token_counts(prompts_data, len(questions)), output_file)
 
     print("\n✓ Prompt generation complete!")
     print(f"✓ Output saved to: {output_file}")
@@ -5,13 +5,27 @@ More efficient and intuitive than pairwise comparison.
 """
 
 import argparse
+import hashlib
+import sqlite3
 import json
 import csv
 import os
+import re
+import threading
 import time
-from typing import List, Dict, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 
 JUDGE_SYSTEM_PROMPT = """You are an expert evaluator assessing the quality of AI-generated responses.
@@ -41,16 +55,142 @@ Example output:
 }"""
 
 
+# Columns of the scores CSV
+CSV_COLUMNS = [
+    'question_id',
+    'category',
+    'model_id',
+    'level',
+    'factuality',
+    'helpfulness',
+    'structure',
+    'conciseness',
+    'total_score',
+    'reasoning',
+    'prompt_tokens',
+    'completion_tokens',
+    'latency_ms',
+    'energy_joule'
+]
+
+# Durable store of judged rows; value columns are untyped so values
+# round-trip to the CSV exactly as they were written. A row is keyed by the
+# judge setup and a hash of the judged (question, response) pair, so a new
+# inference run or another judge model never reuses or overwrites its scores
+SCORES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS judged_scores (
+    question_id INTEGER NOT NULL,
+    category,
+    model_id TEXT NOT NULL,
+    level TEXT NOT NULL,
+    factuality,
+    helpfulness,
+    structure,
+    conciseness,
+    total_score,
+    reasoning,
+    prompt_tokens,
+    completion_tokens,
+    latency_ms,
+    energy_joule,
+    judge_model TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    response_hash TEXT NOT NULL,
+    is_error INTEGER NOT NULL,
+    PRIMARY KEY (question_id, model_id, level, judge_model, turn, response_hash)
+)"""
+
+# Length of the rate limiter's window (limits are per minute)
+RATE_WINDOW_SEC = 60.0
+
+# Batch statuses after which a batch will not change any more
+BATCH_FINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+# Fields every judgment must contain
+REQUIRED_FIELDS = frozenset({'factuality', 'helpfulness', 'structure', 'conciseness', 'total'})
+
+# Fallback for replies that are not valid JSON: pull out the total score alone
+_TOTAL_RE = re.compile(r'"total":\s*([\d.]+)')
+
+
+def open_scores_db(db_path: str) -> sqlite3.Connection:
+    """Open (creating if needed) the scores database in WAL mode."""
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Durable per commit under WAL without a full fsync
+    conn.execute(SCORES_TABLE_SQL)
+    return conn
+
+
+def score_key(result: Dict, question_text: str) -> Tuple[int, str, str, str]:
+    """(question_id, model_id, level, response_hash) identifying one judged response."""
+    response_hash = hashlib.sha256(
+        f"{question_text}\0{result['output_text']}".encode('utf-8')
+    ).hexdigest()
+    return result['question_id'], result['model_id'], result['level'], response_hash
+
+
+def load_judged_scores(conn: sqlite3.Connection, judge_model: str, turn_index: int) -> Dict[Tuple, Dict]:
+    """Scores of rows already judged successfully with this setup, keyed by score_key."""
+    rows = conn.execute(
+        "SELECT question_id, model_id, level, response_hash, "
+        "factuality, helpfulness, structure, conciseness, total_score, reasoning "
+        "FROM judged_scores WHERE judge_model = ? AND turn = ? AND is_error = 0",
+        (judge_model, turn_index)
+    )
+    fields = ('factuality', 'helpfulness', 'structure', 'conciseness', 'total', 'reasoning')
+    return {tuple(row[:4]): dict(zip(fields, row[4:])) for row in rows}
+
+
+def save_score_row(
+    conn: sqlite3.Connection,
+    row: Dict,
+    key: Tuple,
+    judge_model: str,
+    turn_index: int,
+    is_error: bool = False
+):
+    """Insert or replace one judged row (see build_row) under its score_key and commit it."""
+    conn.execute(
+        f"INSERT OR REPLACE INTO judged_scores ({', '.join(CSV_COLUMNS)}, judge_model, turn, response_hash, is_error) "
+        f"VALUES ({', '.join(':' + column for column in CSV_COLUMNS)}, :judge_model, :turn, :response_hash, :is_error)",
+        {**row, 'judge_model': judge_model, 'turn': turn_index, 'response_hash': key[3], 'is_error': int(is_error)}
+    )
+    conn.commit()
+
+
+def export_scores_csv(
+    conn: sqlite3.Connection,
+    output_csv: str,
+    keys: set,
+    judge_model: str,
+    turn_index: int
+) -> int:
+    """Write the stored rows of the given score keys for this setup to the scores CSV; returns the number of rows."""
+    os.makedirs(os.path.dirname(output_csv) or '.', exist_ok=True)
+    stored = conn.execute(
+        f"SELECT question_id, model_id, level, response_hash, {', '.join(CSV_COLUMNS)} FROM judged_scores "
+        "WHERE judge_model = ? AND turn = ? ORDER BY model_id, question_id, level",
+        (judge_model, turn_index)
+    )
+    rows = [row[4:] for row in stored if tuple(row[:4]) in keys]
+
+    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(rows)
+
+    return len(rows)
+
+
 def load_question_data(questions_file: str) -> Dict[int, Dict]:
     """Load original questions from JSONL file."""
-    questions = {}
-
-    with open(questions_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                data = json.loads(line)
-                qid = data['question_id']
-                questions[qid] = data
+    with open(questions_file, 'rb') as f:
+        questions = {
+            data['question_id']: data
+            for data in (json_loads(line) for line in f if not line.isspace())
+        }
 
     print(f"Loaded {len(questions)} questions from {questions_file}")
     return questions
@@ -58,14 +198,8 @@ def load_question_data(questions_file: str) -> Dict[int, Dict]:
 
 def load_inference_results(jsonl_file: str) -> List[Dict]:
     """Load inference results from JSONL file."""
-    results = []
-
-    with open(jsonl_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                results.append(json.loads(line))
-
-    return results
+    with open(jsonl_file, 'rb') as f:
+        return [json_loads(line) for line in f if not line.isspace()]
 
 
 def organize_results_by_model(results: List[Dict]) -> Dict[str, List[Dict]]:
@@ -88,7 +222,155 @@ def organize_results_by_model(results: List[Dict]) -> Dict[str, List[Dict]]:
     return organized
 
 
+def judge_cache_path(cache_dir: Path, question: str, response: str, judge_model: str) -> Path:
+    """Content-addressed cache file for one judge input."""
+    key = hashlib.sha256(
+        f"{judge_model}\0{JUDGE_SYSTEM_PROMPT}\0{question}\0{response}".encode('utf-8')
+    ).hexdigest()
+    return cache_dir / f"{key}.json"
+
+
+def load_cached_judgment(cache_path: Path) -> Optional[Dict]:
+    """Return a cached judgment, or None if there is no (readable) entry."""
+    try:
+        return json.loads(cache_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_judgment(cache_path: Path, judgment: Dict):
+    """Write a judgment to the cache atomically (safe across worker threads)."""
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(judgment), encoding='utf-8')
+    os.replace(tmp_path, cache_path)
+
+
+class RateLimiter:
+    """
+    Sliding-window limiter on requests and tokens per minute, shared by all
+    worker threads. acquire() blocks until a request of the given size fits
+    under both limits.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = deque()  # (timestamp, tokens) of requests in the last minute
+        self.window_tokens = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        if self.tpm is not None:
+            # A request larger than the whole TPM budget still runs once the window is empty
+            tokens = min(tokens, self.tpm)
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.window and now - self.window[0][0] >= RATE_WINDOW_SEC:
+                    self.window_tokens -= self.window.popleft()[1]
+
+                fits_requests = self.rpm is None or len(self.window) < self.rpm
+                fits_tokens = self.tpm is None or self.window_tokens + tokens <= self.tpm
+                if fits_requests and fits_tokens:
+                    self.window.append((now, tokens))
+                    self.window_tokens += tokens
+                    return
+
+                wait = RATE_WINDOW_SEC - (now - self.window[0][0])
+            time.sleep(wait)
+
+
+def estimate_tokens(payload: Dict) -> int:
+    """Rough token cost of a judge request: ~4 characters per prompt token plus the reply budget."""
+    return sum(len(message['content']) for message in payload['messages']) // 4 + payload['max_tokens']
+
+
+def create_session(pool_size: int) -> requests.Session:
+    """Create an HTTP session whose keep-alive pool covers every worker thread."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def build_judge_payload(
+    question: str,
+    response: str,
+    judge_model: str = "gpt-4o",
+    temperature: float = 0.0
+) -> Dict:
+    """Build the chat/completions request body that asks the judge to score one response."""
+    user_prompt = f"""Question: {question}
+
+Response to evaluate:
+{response}
+
+Please evaluate this response and return your assessment as JSON."""
+
+    return {
+        "model": judge_model,
+        "messages": [
+            {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": temperature,
+        "max_tokens": 300,
+        "response_format": {"type": "json_object"}  # Force JSON output
+    }
+
+
+def parse_judgment(judgment_text: str, cache_path: Optional[Path] = None) -> Tuple[Dict, bool]:
+    """
+    Parse the judge's JSON reply into (scores dict, is_fallback).
+
+    Falls back to default scores when fields are missing, or to the "total"
+    value alone when the reply is not valid JSON; raises if neither works.
+    is_fallback is True for those fallbacks, so they can be judged again.
+    A fully valid judgment is saved to cache_path when one is given.
+    """
+    try:
+        judgment = json.loads(judgment_text)
+
+        # Validate required fields
+        if isinstance(judgment, dict) and judgment.keys() >= REQUIRED_FIELDS:
+            if cache_path is not None:
+                save_cached_judgment(cache_path, judgment)
+            return judgment, False
+        else:
+            print(f"Warning: Missing required fields in judgment, using defaults")
+            return {
+                'factuality': 0.0,
+                'helpfulness': 0.0,
+                'structure': 0.0,
+                'conciseness': 0.0,
+                'total': 0.0,
+                'reasoning': 'Parsing error'
+            }, True
+
+    except json.JSONDecodeError as e:
+        print(f"Warning: Failed to parse JSON judgment: {e}")
+        print(f"Raw response: {judgment_text[:200]}")
+
+        # Fallback: try to extract total score
+        match = _TOTAL_RE.search(judgment_text)
+        if match:
+            total = float(match.group(1))
+            return {
+                'factuality': total / 4,
+                'helpfulness': total / 4,
+                'structure': total / 4,
+                'conciseness': total / 4,
+                'total': total,
+                'reasoning': 'Partially parsed'
+            }, True
+        else:
+            raise
+
+
 def call_judge_api(
+    session: requests.Session,
     api_url: str,
     api_key: str,
     question: str,
@@ -96,12 +378,14 @@ def call_judge_api(
     judge_model: str = "gpt-4o",
     temperature: float = 0.0,
     max_retries: int = 3,
-    sleep_time: float = 0.2
-) -> Dict:
+    rate_limiter: Optional[RateLimiter] = None,
+    cache_path: Optional[Path] = None
+) -> Tuple[Dict, bool]:
     """
     Call LLM-as-Judge API to score a single response.
 
     Args:
+        session: HTTP session (reuses connections across calls)
         api_url: API endpoint URL
         api_key: API key
         question: Original question
@@ -109,79 +393,45 @@ def call_judge_api(
         judge_model: Model to use for judging
         temperature: Sampling temperature
         max_retries: Maximum retry attempts
+        rate_limiter: If given, every attempt waits for request/token budget
+        cache_path: If given, a valid judgment is saved here
 
     Returns:
-        Dict with scores: {factuality, helpfulness, structure, conciseness, total, reasoning}
+        Dict with scores: {factuality, helpfulness, structure, conciseness, total, reasoning},
+        and whether they are a parse_judgment fallback
     """
-    user_prompt = f"""Question: {question}
-
-Response to evaluate:
-{response}
-
-Please evaluate this response and return your assessment as JSON."""
-
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {api_key}"
     }
 
-    payload = {
-        "model": judge_model,
-        "messages": [
-            {"role": "system", "content": JUDGE_SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt}
-        ],
-        "temperature": temperature,
-        "max_tokens": 300,
-        "response_format": {"type": "json_object"}  # Force JSON output
-    }
+    payload = build_judge_payload(question, response, judge_model, temperature)
+    estimated_tokens = estimate_tokens(payload)
 
     for attempt in range(max_retries):
         try:
-            response_obj = requests.post(api_url, headers=headers, json=payload, timeout=30)
+            if rate_limiter is not None:
+                rate_limiter.acquire(estimated_tokens)
+
+            response_obj = session.post(api_url, headers=headers, json=payload, timeout=30)
+
+            # Rate limited: wait as long as the server asks before retrying
+            if response_obj.status_code == 429 and attempt < max_retries - 1:
+                try:
+                    wait = float(response_obj.headers.get('Retry-After', ''))
+                except ValueError:
+                    wait = 2 ** attempt
+                print(f"Rate limited (attempt {attempt + 1}/{max_retries}), retrying in {wait:.1f}s")
+                time.sleep(wait)
+                continue
+
             response_obj.raise_for_status()
 
             result = response_obj.json()
             judgment_text = result['choices'][0]['message']['content'].strip()
 
             # Parse JSON response
-            try:
-                judgment = json.loads(judgment_text)
-
-                # Validate required fields
-                required_fields = ['factuality', 'helpfulness', 'structure', 'conciseness', 'total']
-                if all(field in judgment for field in required_fields):
-                    return judgment
-                else:
-                    print(f"Warning: Missing required fields in judgment, using defaults")
-                    return {
-                        'factuality': 0.0,
-                        'helpfulness': 0.0,
-                        'structure': 0.0,
-                        'conciseness': 0.0,
-                        'total': 0.0,
-                        'reasoning': 'Parsing error'
-                    }
-
-            except json.JSONDecodeError as e:
-                print(f"Warning: Failed to parse JSON judgment: {e}")
-                print(f"Raw response: {judgment_text[:200]}")
-
-                # Fallback: try to extract total score
-                import re
-                match = re.search(r'"total":\s*([\d.]+)', judgment_text)
-                if match:
-                    total = float(match.group(1))
-                    return {
-                        'factuality': total / 4,
-                        'helpfulness': total / 4,
-                        'structure': total / 4,
-                        'conciseness': total / 4,
-                        'total': total,
-                        'reasoning': 'Partially parsed'
-                    }
-                else:
-                    raise
+            return parse_judgment(judgment_text, cache_path)
 
         except requests.exceptions.RequestException as e:
             print(f"API request failed (attempt {attempt + 1}/{max_retries}): {e}")
@@ -199,6 +449,103 @@ Please evaluate this response and return your assessment as JSON."""
     raise RuntimeError(f"Failed to get judgment after {max_retries} attempts")
 
 
+def resolve_question_texts(
+    results: List[Dict],
+    questions: Dict[int, Dict],
+    turn_index: int
+) -> List[Tuple[Dict, str]]:
+    """
+    Pair each result with the question text it answered.
+
+    Results whose question or turn is missing are dropped up front and
+    reported in a single summary, so only judgeable work reaches the API.
+    The pairs are grouped by question: every judge request starts with the
+    same system prompt followed by the question, so sending a question's
+    responses back to back lets the API's prompt cache reuse that prefix.
+    """
+    valid_results = []
+    missing_qids = set()
+    for result in results:
+        question_data = questions.get(result['question_id'])
+        turns = question_data.get('turns', []) if question_data else []
+        if len(turns) > turn_index:
+            valid_results.append((result, turns[turn_index]))
+        else:
+            missing_qids.add(result['question_id'])
+
+    valid_results.sort(key=lambda pair: pair[0]['question_id'])
+
+    skipped = len(results) - len(valid_results)
+    if skipped:
+        print(f"  Warning: Skipping {skipped} results whose question or turn {turn_index} is missing "
+              f"(questions: {', '.join(str(qid) for qid in sorted(missing_qids))})")
+
+    return valid_results
+
+
+def build_row(result: Dict, scores: Optional[Dict] = None, error=None) -> Dict:
+    """
+    Scores row keyed by CSV_COLUMNS for one result.
+
+    Pass the parsed scores of a judged result, or the error for a result that
+    could not be judged (its scores are stored as zeros).
+    """
+    if scores is None:
+        scores = {'reasoning': f'Error: {str(error)[:50]}'}
+
+    return {
+        'question_id': result['question_id'],
+        'category': result['category'],
+        'model_id': result['model_id'],
+        'level': result['level'],
+        'factuality': round(scores.get('factuality', 0), 2),
+        'helpfulness': round(scores.get('helpfulness', 0), 2),
+        'structure': round(scores.get('structure', 0), 2),
+        'conciseness': round(scores.get('conciseness', 0), 2),
+        'total_score': round(scores.get('total', 0), 2),
+        'reasoning': scores.get('reasoning', ''),
+        'prompt_tokens': result.get('prompt_tokens', 0),
+        'completion_tokens': result.get('completion_tokens', 0),
+        'latency_ms': round(result.get('latency_ms', 0), 2),
+        'energy_joule': round(result.get('energy_joule', 0), 4)
+    }
+
+
+def judge_one(
+    session: requests.Session,
+    question_text: str,
+    output_text: str,
+    api_url: str,
+    api_key: str,
+    judge_model: str,
+    rate_limiter: RateLimiter,
+    max_retries: int,
+    cache_dir: Optional[Path] = None
+) -> Tuple[Dict, bool]:
+    """Score one output in a worker thread; returns (scores, is_fallback).
+
+    With a cache_dir, a cached judgment is returned without calling the API.
+    """
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = judge_cache_path(cache_dir, question_text, output_text, judge_model)
+        cached = load_cached_judgment(cache_path)
+        if cached is not None:
+            return cached, False
+
+    return call_judge_api(
+        session=session,
+        api_url=api_url,
+        api_key=api_key,
+        question=question_text,
+        response=output_text,
+        judge_model=judge_model,
+        max_retries=max_retries,
+        rate_limiter=rate_limiter,
+        cache_path=cache_path
+    )
+
+
 def judge_all_outputs(
     results: List[Dict],
     questions: Dict[int, Dict],
@@ -206,13 +553,24 @@ def judge_all_outputs(
     api_key: str,
     judge_model: str,
     output_csv: str,
+    db_path: str,
     turn_index: int = 0,
-    sleep_time: float = 0.2,
-    max_retries: int = 3
+    rpm: Optional[int] = 300,
+    tpm: Optional[int] = None,
+    max_retries: int = 3,
+    concurrency: int = 4,
+    cache_dir: Optional[str] = None
 ):
     """
     Judge all outputs with absolute scoring.
 
+    Judge calls run concurrently in up to `concurrency` worker threads. Each
+    row is committed to the SQLite database at db_path as it completes, and
+    responses already judged there (same judge model, turn, question and
+    output text) are not judged again, so an interrupted run resumes where it
+    stopped. The CSV is exported from the database at the end and holds
+    exactly the given results.
+
     Args:
         results: List of inference results
         questions: Original question data
@@ -220,115 +578,264 @@ def judge_all_outputs(
         api_key: API key
         judge_model: Judge model name
         output_csv: Output CSV file path
+        db_path: SQLite database holding judged rows
         turn_index: Which turn to evaluate (default: 0 = first turn)
+        rpm: Maximum judge requests per minute (None for no limit)
+        tpm: Maximum estimated judge tokens per minute (None for no limit)
+        concurrency: Maximum number of judge calls in flight
+        cache_dir: Directory of cached judgments to reuse (None disables caching)
     """
     print(f"\nJudging {len(results)} outputs...")
+    valid_results = resolve_question_texts(results, questions, turn_index)
 
-    # Create output directory
-    os.makedirs(os.path.dirname(output_csv) or '.', exist_ok=True)
+    if cache_dir is not None:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        print(f"Using judge cache: {cache_dir}")
 
-    # Open CSV for writing
-    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
+    rate_limiter = RateLimiter(rpm, tpm)
+
+    # All workers share one pooled HTTP session; only this thread touches the database
+    with closing(open_scores_db(db_path)) as conn, \
+            create_session(concurrency) as session, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            judged = load_judged_scores(conn, judge_model, turn_index)
+            keys = set()
+
+            # Submit a judge call for each result
+            futures = {}
+            resumed = 0
+            for result, question_text in valid_results:
+                key = score_key(result, question_text)
+                keys.add(key)
+
+                if key in judged:
+                    # Same response already judged: keep its scores, refresh the run metrics
+                    save_score_row(conn, build_row(result, judged[key]), key, judge_model, turn_index)
+                    resumed += 1
+                    continue
+
+                future = executor.submit(
+                    judge_one,
+                    session,
+                    question_text,
+                    result['output_text'],
+                    api_url,
+                    api_key,
+                    judge_model,
+                    rate_limiter,
+                    max_retries,
+                    cache_dir
+                )
+                futures[future] = (result, key)
+
+            if resumed:
+                print(f"Resuming: {resumed} results already judged in {db_path}")
+
+            # Save each result as its judgment completes
+            for i, future in enumerate(as_completed(futures), 1):
+                result, key = futures[future]
+                question_id = result['question_id']
+                model_id = result['model_id']
+                level = result['level']
+
+                try:
+                    scores, is_fallback = future.result()
+                    print(f"  [{i}/{len(futures)}] Judged Q{question_id} - {model_id} - {level}")
+
+                    # Save result (fallback scores are judged again on the next run)
+                    save_score_row(conn, build_row(result, scores), key, judge_model, turn_index, is_error=is_fallback)
+
+                    print(f"    Score: {scores['total']:.1f}/10 - {scores.get('reasoning', '')[:50]}")
+
+                except Exception as e:
+                    print(f"  Error judging Q{question_id} {model_id} {level}: {e}")
+
+                    # Save error row with zeros (retried on the next run)
+                    save_score_row(conn, build_row(result, error=e), key, judge_model, turn_index, is_error=True)
+        except BaseException:
+            # Don't let the executor run (and pay for) the queued calls on Ctrl-C or a crash
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+        row_count = export_scores_csv(conn, output_csv, keys, judge_model, turn_index)
+
+    print(f"\nJudging complete! {row_count} results saved to: {output_csv}")
+
+
+def judge_all_outputs_batch(
+    results: List[Dict],
+    questions: Dict[int, Dict],
+    api_url: str,
+    api_key: str,
+    judge_model: str,
+    output_csv: str,
+    db_path: str,
+    turn_index: int = 0,
+    poll_interval: float = 30.0,
+    cache_dir: Optional[str] = None
+):
+    """
+    Judge all outputs with one OpenAI Batch API job instead of realtime calls.
 
-        # Write header
-        writer.writerow([
-            'question_id',
-            'category',
-            'model_id',
-            'level',
-            'factuality',
-            'helpfulness',
-            'structure',
-            'conciseness',
-            'total_score',
-            'reasoning',
-            'prompt_tokens',
-            'completion_tokens',
-            'latency_ms',
-            'energy_joule'
-        ])
-
-        # Judge each result
-        for i, result in enumerate(results, 1):
+    All judge requests are uploaded as a JSONL file, a batch is created for
+    the chat/completions endpoint, and its output is polled for and saved to
+    the SQLite database at db_path (responses already judged there are not
+    resubmitted) before the CSV of the given results is exported. Batch jobs are cheaper and not
+    bound by realtime rate limits, but may take up to the 24h completion window.
+
+    Args:
+        results: List of inference results
+        questions: Original question data
+        api_url: Judge chat/completions URL; the files and batches endpoints
+            are resolved relative to it
+        api_key: API key
+        judge_model: Judge model name
+        output_csv: Output CSV file path
+        db_path: SQLite database holding judged rows
+        turn_index: Which turn to evaluate (default: 0 = first turn)
+        poll_interval: Seconds between batch status checks
+        cache_dir: Directory of cached judgments to reuse (None disables caching)
+    """
+    print(f"\nJudging {len(results)} outputs with the Batch API...")
+    valid_results = resolve_question_texts(results, questions, turn_index)
+
+    # e.g. https://api.openai.com/v1/chat/completions -> https://api.openai.com/v1
+    base_url = api_url.rsplit('/chat/completions', 1)[0]
+    endpoint = urlparse(api_url).path
+
+    if cache_dir is not None:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        print(f"Using judge cache: {cache_dir}")
+
+    with closing(open_scores_db(db_path)) as conn, requests.Session() as session:
+        session.headers['Authorization'] = f"Bearer {api_key}"
+        judged = load_judged_scores(conn, judge_model, turn_index)
+        keys = set()
+
+        # Build one batch request per result (cached judgments are saved now)
+        pending = {}
+        lines = []
+        resumed = 0
+        for index, (result, question_text) in enumerate(valid_results):
             question_id = result['question_id']
-            model_id = result['model_id']
-            level = result['level']
-            category = result['category']
-            output_text = result['output_text']
-
-            # Get original question
-            question_data = questions.get(question_id)
-            if not question_data:
-                print(f"  Warning: Question {question_id} not found, skipping")
-                continue
+            key = score_key(result, question_text)
+            keys.add(key)
 
-            # Get question text (first turn)
-            if 'turns' in question_data and len(question_data['turns']) > turn_index:
-                question_text = question_data['turns'][turn_index]
-            else:
-                print(f"  Warning: Turn {turn_index} not found for Q{question_id}, skipping")
+            if key in judged:
+                # Same response already judged: keep its scores, refresh the run metrics
+                save_score_row(conn, build_row(result, judged[key]), key, judge_model, turn_index)
+                resumed += 1
                 continue
 
-            try:
-                # Call judge
-                print(f"  [{i}/{len(results)}] Judging Q{question_id} - {model_id} - {level}")
-
-                scores = call_judge_api(
-                    api_url=api_url,
-                    api_key=api_key,
-                    question=question_text,
-                    response=output_text,
-                    judge_model=judge_model,
-                    max_retries=max_retries,
-                    sleep_time=sleep_time
+            cache_path = None
+            if cache_dir is not None:
+                cache_path = judge_cache_path(cache_dir, question_text, result['output_text'], judge_model)
+                cached = load_cached_judgment(cache_path)
+                if cached is not None:
+                    save_score_row(conn, build_row(result, cached), key, judge_model, turn_index)
+                    continue
+
+            custom_id = f"{index}-{question_id}-{result['model_id']}-{result['level']}"
+            pending[custom_id] = (result, key, cache_path)
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": endpoint,
+                "body": build_judge_payload(question_text, result['output_text'], judge_model)
+            }) + '\n')
+
+        if resumed:
+            print(f"Resuming: {resumed} results already judged in {db_path}")
+
+        if not pending:
+            print("All judgments are stored or cached, nothing to submit")
+        else:
+            # Upload the requests and create the batch
+            upload = session.post(
+                f"{base_url}/files",
+                data={'purpose': 'batch'},
+                files={'file': ('judge_batch.jsonl', ''.join(lines).encode('utf-8'))},
+                timeout=300
+            )
+            upload.raise_for_status()
+
+            batch_obj = session.post(
+                f"{base_url}/batches",
+                json={
+                    'input_file_id': upload.json()['id'],
+                    'endpoint': endpoint,
+                    'completion_window': '24h'
+                },
+                timeout=30
+            )
+            batch_obj.raise_for_status()
+            batch = batch_obj.json()
+            print(f"  Submitted batch {batch['id']} with {len(pending)} requests")
+
+            # Poll until the batch reaches a final status
+            while batch['status'] not in BATCH_FINAL_STATUSES:
+                time.sleep(poll_interval)
+                batch_obj = session.get(f"{base_url}/batches/{batch['id']}", timeout=30)
+                batch_obj.raise_for_status()
+                batch = batch_obj.json()
+                counts = batch.get('request_counts') or {}
+                print(f"  Batch {batch['id']}: {batch['status']} "
+                      f"({counts.get('completed', 0)}/{counts.get('total', len(pending))} done)")
+
+            if batch['status'] != 'completed':
+                print(f"  Warning: Batch ended with status '{batch['status']}'")
+
+            # Successful and failed requests are reported in separate files
+            for file_id in (batch.get('output_file_id'), batch.get('error_file_id')):
+                if not file_id:
+                    continue
+                content = session.get(f"{base_url}/files/{file_id}/content", timeout=300)
+                content.raise_for_status()
+
+                for line in content.text.splitlines():
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record.get('custom_id') not in pending:
+                        continue
+                    result, key, cache_path = pending.pop(record['custom_id'])
+
+                    try:
+                        response_obj = record.get('response') or {}
+                        if record.get('error') or response_obj.get('status_code') != 200:
+                            raise RuntimeError(record.get('error') or response_obj.get('body'))
+
+                        judgment_text = response_obj['body']['choices'][0]['message']['content'].strip()
+                        scores, is_fallback = parse_judgment(judgment_text, cache_path)
+                        save_score_row(
+                            conn, build_row(result, scores), key, judge_model, turn_index, is_error=is_fallback
+                        )
+
+                    except Exception as e:
+                        print(f"  Error judging Q{result['question_id']} {result['model_id']} {result['level']}: {e}")
+                        save_score_row(conn, build_row(result, error=e), key, judge_model, turn_index, is_error=True)
+
+            # Requests the batch never reported on
+            for result, key, _ in pending.values():
+                save_score_row(
+                    conn, build_row(result, error=f"no batch result ({batch['status']})"),
+                    key, judge_model, turn_index, is_error=True
                 )
 
-                # Write result
-                writer.writerow([
-                    question_id,
-                    category,
-                    model_id,
-                    level,
-                    round(scores.get('factuality', 0), 2),
-                    round(scores.get('helpfulness', 0), 2),
-                    round(scores.get('structure', 0), 2),
-                    round(scores.get('conciseness', 0), 2),
-                    round(scores.get('total', 0), 2),
-                    scores.get('reasoning', ''),
-                    result.get('prompt_tokens', 0),
-                    result.get('completion_tokens', 0),
-                    round(result.get('latency_ms', 0), 2),
-                    round(result.get('energy_joule', 0), 4)
-                ])
-
-                print(f"    Score: {scores['total']:.1f}/10 - {scores.get('reasoning', '')[:50]}")
-
-                if i % 10 == 0:
-                    f.flush()  # Flush to disk periodically
-
-                # Rate limiting
-                time.sleep(sleep_time)
-
-            except Exception as e:
-                print(f"  Error judging Q{question_id} {model_id} {level}: {e}")
-
-                # Write error row with zeros
-                writer.writerow([
-                    question_id,
-                    category,
-                    model_id,
-                    level,
-                    0, 0, 0, 0, 0,
-                    f'Error: {str(e)[:50]}',
-                    result.get('prompt_tokens', 0),
-                    result.get('completion_tokens', 0),
-                    round(result.get('latency_ms', 0), 2),
-                    round(result.get('energy_joule', 0), 4)
-                ])
-                continue
+        row_count = export_scores_csv(conn, output_csv, keys, judge_model, turn_index)
 
-    print(f"\nJudging complete! Results saved to: {output_csv}")
+    print(f"\nJudging complete! {row_count} results saved to: {output_csv}")
+
+
+def positive_int(value: str) -> int:
+    """argparse type for limits that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
 
 
 def main():
@@ -372,6 +879,19 @@ def main():
         help='Output CSV file path (default: scores_absolute.csv)'
     )
 
+    parser.add_argument(
+        '--db',
+        default=None,
+        help='SQLite database of judged rows; a rerun skips responses already judged with the same '
+             'judge model and turn, delete it to re-judge everything (default: --out with .db extension)'
+    )
+
+    parser.add_argument(
+        '--export_only',
+        action='store_true',
+        help='Only export the rows of --runs stored in --db to --out, without judging'
+    )
+
     parser.add_argument(
         '--turn',
         type=int,
@@ -381,10 +901,17 @@ def main():
     )
 
     parser.add_argument(
-        '--sleep',
-        type=float,
-        default=0.2,
-        help='Sleep time between API calls in seconds (default: 0.2)'
+        '--rpm',
+        type=positive_int,
+        default=300,
+        help='Maximum judge API requests per minute (default: 300)'
+    )
+
+    parser.add_argument(
+        '--tpm',
+        type=positive_int,
+        default=None,
+        help='Maximum estimated judge API tokens per minute (default: no limit)'
     )
 
     parser.add_argument(
@@ -394,7 +921,52 @@ def main():
         help='Number of retries per API call (default: 3)'
     )
 
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Submit all judge requests as one OpenAI Batch API job (cheaper, completes within 24h)'
+    )
+
+    parser.add_argument(
+        '--batch_poll',
+        type=float,
+        default=30.0,
+        help='Seconds between batch status checks with --batch (default: 30)'
+    )
+
+    parser.add_argument(
+        '--use_cache',
+        action='store_true',
+        help='Reuse cached judgments for unchanged (model, question, response) inputs'
+    )
+
+    parser.add_argument(
+        '--cache_dir',
+        default='.judge_cache',
+        help='Judge cache directory used with --use_cache (default: .judge_cache)'
+    )
+
+    parser.add_argument(
+        '--concurrency',
+        type=positive_int,
+        default=4,
+        help='Maximum number of judge API calls in flight (default: 4)'
+    )
+
     args = parser.parse_args()
+    db_path = args.db or os.path.splitext(args.out)[0] + '.db'
+
+    if args.export_only:
+        questions = load_question_data(args.questions)
+        results = load_inference_results(args.runs)
+        keys = {
+            score_key(result, question_text)
+            for result, question_text in resolve_question_texts(results, questions, args.turn - 1)
+        }
+        with closing(open_scores_db(db_path)) as conn:
+            row_count = export_scores_csv(conn, args.out, keys, args.model, args.turn - 1)
+        print(f"Exported {row_count} results from {db_path} to {args.out}")
+        return
 
     # Get API key - support both direct key and env variable
     if args.api_key_env.startswith('sk-'):
@@ -425,17 +997,35 @@ def main():
     print("JUDGING OUTPUTS (ABSOLUTE SCORING)")
     print("="*80)
 
-    judge_all_outputs(
-        results=results,
-        questions=questions,
-        api_url=args.api_url,
-        api_key=api_key,
-        judge_model=args.model,
-        output_csv=args.out,
-        turn_index=args.turn - 1,  # Convert to 0-based index
-        sleep_time=args.sleep,
-        max_retries=args.retries
-    )
+    if args.batch:
+        judge_all_outputs_batch(
+            results=results,
+            questions=questions,
+            api_url=args.api_url,
+            api_key=api_key,
+            judge_model=args.model,
+            output_csv=args.out,
+            db_path=db_path,
+            turn_index=args.turn - 1,  # Convert to 0-based index
+            poll_interval=args.batch_poll,
+            cache_dir=args.cache_dir if args.use_cache else None
+        )
+    else:
+        judge_all_outputs(
+            results=results,
+            questions=questions,
+            api_url=args.api_url,
+            api_key=api_key,
+            judge_model=args.model,
+            output_csv=args.out,
+            db_path=db_path,
+            turn_index=args.turn - 1,  # Convert to 0-based index
+            rpm=args.rpm,
+            tpm=args.tpm,
+            max_retries=args.retries,
+            concurrency=args.concurrency,
+            cache_dir=args.cache_dir if args.use_cache else None
+        )
 
     print("\n" + "="*80)
     print("EVALUATION COMPLETE")
@@ -82,7 +82,7 @@ check_dependencies() {
     print_msg "Python version: $python_version"
 
     # Check required packages
-    required_packages=("llama_cpp" "pandas" "openpyxl" "requests")
+    required_packages=("llama_cpp" "numpy" "pandas" "openpyxl" "xlsxwriter" "requests")
 
     for package in "${required_packages[@]}"; do
         if python3 -c "import $package" 2>/dev/null; then
@@ -6,12 +6,14 @@ Runs inference on hierarchical prompts and collects performance metrics.
 import argparse
 import json
 import time
-import csv
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, TextIO
 from dataclasses import dataclass
 
+import pandas as pd
+
 try:
     from llama_cpp import Llama
 except ImportError:
@@ -53,48 +55,52 @@ def load_prompts_from_csv(csv_path: str) -> List[PromptTask]:
     Expected CSV format:
     question_id,category,topic,L0,L1,L2,L3,P
     """
-    prompts = []
-
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-
-        for row in reader:
-            question_id = int(row['question_id'])
-            category = row['category']
-            topic = row['topic']
-
-            # Create tasks for each level
-            for level in ['L0', 'L1', 'L2', 'L3', 'P']:
-                if level in row and row[level]:
-                    task = PromptTask(
-                        question_id=question_id,
-                        category=category,
-                        topic=topic,
-                        level=level,
-                        prompt_text=row[level]
-                    )
-                    prompts.append(task)
+    # Read every cell as text so prompts like "NA" or "" are kept verbatim
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding='utf-8')
+
+    # One row per (question, level), in file order with levels in order
+    levels = [level for level in ['L0', 'L1', 'L2', 'L3', 'P'] if level in df.columns]
+    melted = df.melt(
+        id_vars=['question_id', 'category', 'topic'],
+        value_vars=levels,
+        var_name='level',
+        value_name='prompt_text',
+        ignore_index=False
+    ).sort_index(kind='stable')
+    melted = melted[melted['prompt_text'] != '']
+    melted['question_id'] = melted['question_id'].astype(int)
+
+    prompts = [PromptTask(*row) for row in melted.itertuples(index=False, name=None)]
 
     print(f"Loaded {len(prompts)} prompt tasks from {csv_path}")
     return prompts
 
 
+# (lowercase filename substring, short model ID), checked in order
+MODEL_ID_PATTERNS = (
+    ('qwen1.5', 'qwen1.5-1.8b'),
+    ('qwen-1.5', 'qwen1.5-1.8b'),
+    ('gemma-2-2b', 'gemma-2-2b'),
+    ('gemma2-2b', 'gemma-2-2b'),
+    ('phi-3.5', 'phi-3.5-mini'),
+    ('phi3.5', 'phi-3.5-mini'),
+    ('qwen3-4b', 'qwen3-4b'),
+    ('qwen-3-4b', 'qwen3-4b'),
+)
+
+
 def extract_model_id(model_path: str) -> str:
     """Extract short model ID from full path."""
     filename = Path(model_path).stem
+    name = filename.lower()
 
     # Map common patterns to short IDs
-    if 'qwen1.5' in filename.lower() or 'qwen-1.5' in filename.lower():
-        return 'qwen1.5-1.8b'
-    elif 'gemma-2-2b' in filename.lower() or 'gemma2-2b' in filename.lower():
-        return 'gemma-2-2b'
-    elif 'phi-3.5' in filename.lower() or 'phi3.5' in filename.lower():
-        return 'phi-3.5-mini'
-    elif 'qwen3-4b' in filename.lower() or 'qwen-3-4b' in filename.lower():
-        return 'qwen3-4b'
-    else:
-        # Fallback: use filename without extension
-        return filename.replace('-Q6_K', '').replace('-q6_k', '')
+    for pattern, model_id in MODEL_ID_PATTERNS:
+        if pattern in name:
+            return model_id
+
+    # Fallback: use filename without extension
+    return filename.replace('-Q6_K', '').replace('-q6_k', '')
 
 
 def load_model(model_path: str, n_ctx: int = 4096, n_gpu_layers: int = -1) -> Llama:
@@ -138,6 +144,10 @@ def run_inference(
     """
     Run inference and return output text and token counts.
 
+    The model keeps the KV cache of the previous call and only evaluates the
+    prompt tokens after the prefix shared with it, so a question's levels
+    (each one extending the last) reuse the prefill of the level run before.
+
     Args:
         model: Loaded Llama model
         prompt: Input prompt text
@@ -191,12 +201,11 @@ def run_single_task(
     """
     print(f"  [{task.level}] Q{task.question_id} - {task.category}")
 
-    # Clear old samples
+    # Clear old samples (synchronous; energy only counts samples from t_start on)
     monitor.clear_samples()
-    time.sleep(0.1)
 
-    # Start timing and run inference
-    t_start = time.time()
+    # Start timing and run inference (monotonic clock, as used by the monitor)
+    t_start = time.monotonic()
 
     output_text, prompt_tokens, completion_tokens = run_inference(
         model=model,
@@ -205,7 +214,7 @@ def run_single_task(
         max_tokens=max_tokens
     )
 
-    t_end = time.time()
+    t_end = time.monotonic()
 
     # Calculate metrics
     latency_ms = (t_end - t_start) * 1000.0
@@ -228,8 +237,8 @@ def run_single_task(
     )
 
 
-def save_result_jsonl(result: InferenceResult, output_file: str):
-    """Append inference result to JSONL file."""
+def save_result_jsonl(result: InferenceResult, out_f: TextIO):
+    """Append inference result to an open JSONL file."""
     record = {
         'question_id': result.question_id,
         'model_id': result.model_id,
@@ -242,8 +251,7 @@ def save_result_jsonl(result: InferenceResult, output_file: str):
         'output_text': result.output_text
     }
 
-    with open(output_file, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    out_f.write(json.dumps(record, ensure_ascii=False) + '\n')
 
 
 def run_benchmark(
@@ -254,7 +262,8 @@ def run_benchmark(
     max_tokens: int = 1024,
     idle_duration: float = 10.0,
     n_ctx: int = 4096,
-    n_gpu_layers: int = -1
+    n_gpu_layers: int = -1,
+    overlap_idle_load: bool = False
 ):
     """
     Run full benchmark across all models and prompts.
@@ -268,6 +277,8 @@ def run_benchmark(
         idle_duration: Idle power measurement duration (seconds)
         n_ctx: Context window size
         n_gpu_layers: GPU layers to offload
+        overlap_idle_load: Load the first model while idle power is measured
+            (saves the load time, but loading raises the measured idle power)
     """
     # Load prompts
     print("="*80)
@@ -275,61 +286,79 @@ def run_benchmark(
     print("="*80)
     tasks = load_prompts_from_csv(prompts_csv)
 
+    # Run similar-length prompts back to back: questions ordered by category and
+    # base prompt length, each question's levels kept together from shortest up
+    base_len = {task.question_id: len(task.prompt_text) for task in tasks if task.level == 'L0'}
+    tasks.sort(key=lambda t: (t.category, base_len.get(t.question_id, 0), t.question_id, len(t.prompt_text)))
+
     # Create output directory
     os.makedirs(os.path.dirname(output_jsonl) or '.', exist_ok=True)
 
-    # Initialize power monitor
-    print("\n" + "="*80)
-    print("INITIALIZING POWER MONITOR")
-    print("="*80)
-
-    monitor = TegrastatsMonitor(interval_ms=100)
-    monitor.start()
-
-    try:
-        # Measure idle power
-        idle_power = monitor.measure_idle(duration_sec=idle_duration)
-
-        # Run benchmark for each model
-        for model_path in model_paths:
-            model_id = extract_model_id(model_path)
-
-            print("\n" + "="*80)
-            print(f"BENCHMARKING: {model_id}")
-            print("="*80)
-
-            # Load model
-            model = load_model(model_path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers)
-
-            # Run all tasks
-            for i, task in enumerate(tasks, 1):
-                print(f"\nTask {i}/{len(tasks)}")
-
-                try:
-                    result = run_single_task(
-                        model=model,
-                        model_id=model_id,
-                        task=task,
-                        monitor=monitor,
-                        idle_power=idle_power,
-                        temperature=temperature,
-                        max_tokens=max_tokens
-                    )
-
-                    # Save result
-                    save_result_jsonl(result, output_jsonl)
-
-                except Exception as e:
-                    print(f"    ERROR: {e}")
-                    continue
-
-            # Unload model
-            del model
-            print(f"\nCompleted {model_id}")
-
-    finally:
-        # Stop monitor
-        monitor.stop()
+    # One line-buffered handle for the whole run: each result reaches the file
+    # as soon as it is written, without reopening the file per record
+    with open(output_jsonl, 'a', encoding='utf-8', buffering=1) as out_f:
+        # Initialize power monitor
+        print("\n" + "="*80)
+        print("INITIALIZING POWER MONITOR")
+        print("="*80)
+
+        monitor = TegrastatsMonitor(interval_ms=100)
+        monitor.start()
+
+        try:
+            # Measure idle power, optionally while the first model loads
+            first_model = None
+            if overlap_idle_load:
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    idle_future = executor.submit(monitor.measure_idle, idle_duration)
+                    first_model = load_model(model_paths[0], n_ctx=n_ctx, n_gpu_layers=n_gpu_layers)
+                    idle_power = idle_future.result()
+            else:
+                idle_power = monitor.measure_idle(duration_sec=idle_duration)
+
+            # Run benchmark for each model
+            for model_path in model_paths:
+                model_id = extract_model_id(model_path)
+
+                print("\n" + "="*80)
+                print(f"BENCHMARKING: {model_id}")
+                print("="*80)
+
+                # Load model (the first one may already be loaded)
+                if first_model is not None:
+                    model, first_model = first_model, None
+                else:
+                    model = load_model(model_path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers)
+
+                # Run all tasks
+                for i, task in enumerate(tasks, 1):
+                    print(f"\nTask {i}/{len(tasks)}")
+
+                    try:
+                        result = run_single_task(
+                            model=model,
+                            model_id=model_id,
+                            task=task,
+                            monitor=monitor,
+                            idle_power=idle_power,
+                            temperature=temperature,
+                            max_tokens=max_tokens
+                        )
+
+                        # Save result
+                        save_result_jsonl(result, out_f)
+
+                    except Exception as e:
+                        print(f"    ERROR: {e}")
+                        continue
+
+                # Unload model
+                del model
+                print(f"\nCompleted {model_id}")
+
+        finally:
+            # Stop monitor
+            monitor.stop()
 
     print("\n" + "="*80)
     print("BENCHMARK COMPLETE")
@@ -396,6 +425,13 @@ def main():
         help='Number of layers to offload to GPU, -1 for all (default: -1)'
     )
 
+    parser.add_argument(
+        '--overlap_idle_load',
+        action='store_true',
+        help='Load the first model during the idle power measurement to save time '
+             '(the load biases the idle baseline upward; off by default)'
+    )
+
     args = parser.parse_args()
 
     # Validate inputs
@@ -417,7 +453,8 @@ def main():
         max_tokens=args.max_tokens,
         idle_duration=args.idle_duration,
         n_ctx=args.n_ctx,
-        n_gpu_layers=args.n_gpu_layers
+        n_gpu_layers=args.n_gpu_layers,
+        overlap_idle_load=args.overlap_idle_load
     )
 
 
@@ -3,16 +3,48 @@ Tegrastats Power Sampler for Jetson Devices
 Monitors power consumption and integrates energy over time.
 """
 
+import os
 import subprocess
 import threading
 import time
-import re
 from typing import Optional, List, Tuple
-from collections import deque
+
+import numpy as np
+
+# Samples kept before the oldest are overwritten (~2.8h at 100ms)
+MAX_SAMPLES = 100000
+
+# Extra ring slots beyond MAX_SAMPLES, so the reader thread can keep writing
+# while a consumer copies the oldest samples without overwriting them
+RING_SLACK = 1024
+
+
+def trapezoid_weights(timestamps: np.ndarray) -> np.ndarray:
+    """
+    Weights w for which the trapezoidal integral of y over timestamps is dot(y, w).
+
+    Each sample is weighted by half the time span to its neighbours,
+    w_i = (t_{i+1} - t_{i-1}) / 2, and the two end samples by half of their
+    single interval. Needs at least two timestamps.
+    """
+    weights = np.empty_like(timestamps)
+    weights[1:-1] = (timestamps[2:] - timestamps[:-2]) * 0.5
+    weights[0] = (timestamps[1] - timestamps[0]) * 0.5
+    weights[-1] = (timestamps[-1] - timestamps[-2]) * 0.5
+    return weights
 
 
 class TegrastatsMonitor:
-    """Monitor Jetson power consumption using tegrastats."""
+    """
+    Monitor Jetson power consumption using tegrastats.
+
+    Samples are stamped with time.monotonic(), so time ranges passed to the
+    query methods must come from the same clock.
+    """
+
+    # Fields holding total input power as "<current mW>/<average mW>",
+    # VDD_IN first, then POM_5V_IN used on some Jetson models
+    _POWER_FIELDS = (b'VDD_IN', b'POM_5V_IN')
 
     def __init__(self, interval_ms: int = 100):
         """
@@ -26,11 +58,23 @@ class TegrastatsMonitor:
         self.thread: Optional[threading.Thread] = None
         self.running = False
 
-        # Store (timestamp, power_mw) tuples
-        self.samples: deque = deque(maxlen=100000)
-        self.lock = threading.Lock()
-
-    def _parse_power(self, line: str) -> Optional[float]:
+        # Lock-free single-producer ring buffer of samples, stored as parallel
+        # timestamp / power arrays. Only the reader thread writes slots and
+        # _written (the total number of samples stored); it publishes a sample
+        # by incrementing _written after filling its slot. Consumers snapshot
+        # _written once and ignore samples before _cleared_at.
+        # The arrays hold the ring twice (sample k at k % capacity and
+        # k % capacity + capacity), so any run of samples is one contiguous slice.
+        # _energy_mj is the running trapezoidal integral of raw power (mJ) from
+        # the first sample ever stored, so any range's energy is a difference
+        self._capacity = MAX_SAMPLES + RING_SLACK
+        self._timestamps = np.empty(2 * self._capacity, dtype=np.float64)
+        self._power_mw = np.empty(2 * self._capacity, dtype=np.float64)
+        self._energy_mj = np.empty(2 * self._capacity, dtype=np.float64)
+        self._written = 0
+        self._cleared_at = 0
+
+    def _parse_power(self, line: bytes) -> Optional[float]:
         """
         Parse power consumption from tegrastats output.
 
@@ -40,41 +84,41 @@ class TegrastatsMonitor:
         GPU@34C PMIC@100C AUX@36C Tdiode@35.75C VDD_IN 2594/2594 VDD_CPU_GPU_CV 307/307
         VDD_SOC 922/922
 
-        We look for VDD_IN (total power in mW)
+        We look for VDD_IN (total power in mW) in the raw output bytes
         """
-        try:
-            # Look for VDD_IN pattern: VDD_IN current/average
-            match = re.search(r'VDD_IN\s+(\d+)/(\d+)', line)
-            if match:
-                current_power = float(match.group(1))  # mW
-                return current_power
-
-            # Alternative: POM_5V_IN on some Jetson models
-            match = re.search(r'POM_5V_IN\s+(\d+)/(\d+)', line)
-            if match:
-                current_power = float(match.group(1))  # mW
-                return current_power
-
-        except Exception as e:
-            pass
+        for field in self._POWER_FIELDS:
+            start = line.find(field)
+            while start >= 0:
+                start += len(field)
+                end = line.find(b'/', start)
+                value = line[start:end]
+                current = value.lstrip()  # Any whitespace between the name and the value
+                if (end > start and len(current) < len(value) and current.isdigit()
+                        and line[end + 1:end + 2].isdigit()):
+                    return float(current)  # mW
+                start = line.find(field, start)
 
         return None
 
     def _reader_thread(self):
         """Background thread to read tegrastats output."""
+        fd = self.process.stdout.fileno()
+        partial = b''
+
         while self.running:
             try:
-                line = self.process.stdout.readline()
-                if not line:
+                # Take whatever the pipe holds and split it into lines here;
+                # the last piece may be an incomplete line kept for the next read
+                chunk = os.read(fd, 65536)
+                if not chunk:
                     break
 
-                line = line.decode('utf-8').strip()
-                power_mw = self._parse_power(line)
+                timestamp = time.monotonic()
+                *lines, partial = (partial + chunk).split(b'\n')
 
-                if power_mw is not None:
-                    timestamp = time.time()
-                    with self.lock:
-                        self.samples.append((timestamp, power_mw))
+                powers_mw = [power for power in map(self._parse_power, lines) if power is not None]
+                if powers_mw:
+                    self._append_samples([timestamp] * len(powers_mw), powers_mw)
 
             except Exception as e:
                 if self.running:
@@ -93,7 +137,7 @@ class TegrastatsMonitor:
                 ['tegrastats', '--interval', str(self.interval_ms)],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                bufsize=1
+                bufsize=0  # Read unbuffered from the pipe fd by the reader thread
             )
 
             self.running = True
@@ -130,10 +174,76 @@ class TegrastatsMonitor:
 
         print("Tegrastats monitor stopped")
 
+    def _append_samples(self, timestamps: List[float], powers_mw: List[float]):
+        """
+        Store a batch of samples (reader thread only), overwriting the oldest
+        once the buffer is full. The batch, at most one pipe read's worth of
+        lines, is published with a single update of _written after all of
+        its slots are filled.
+        """
+        capacity = self._capacity
+        slot = self._written % capacity
+        end = slot + len(timestamps)
+
+        # Extend the running integral from the previous sample (or start it at 0)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        powers_mw = np.asarray(powers_mw, dtype=np.float64)
+        if self._written:
+            last = (self._written - 1) % capacity
+            prev_t, prev_p, prev_e = self._timestamps[last], self._power_mw[last], self._energy_mj[last]
+        else:
+            prev_t, prev_p, prev_e = timestamps[0], powers_mw[0], 0.0
+        steps_mj = (np.diff(timestamps, prepend=prev_t)
+                    * (powers_mw + np.concatenate(([prev_p], powers_mw[:-1]))) * 0.5)
+        energy_mj = prev_e + np.cumsum(steps_mj)
+
+        # Write the batch once where it starts, then its second copy: the upper
+        # half for the part before the wrap point, the lower half for the rest
+        for buffer, values in ((self._timestamps, timestamps), (self._power_mw, powers_mw),
+                               (self._energy_mj, energy_mj)):
+            buffer[slot:end] = values
+            if end <= capacity:
+                buffer[slot + capacity:end + capacity] = values
+            else:
+                buffer[slot + capacity:] = values[:capacity - slot]
+                buffer[:end - capacity] = values[capacity - slot:]
+
+        self._written += len(timestamps)
+
+    def _get_arrays(self, t_start: Optional[float] = None,
+                    t_end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Timestamps, powers (mW) and running energy (mJ) of the samples within
+        a time range, oldest first.
+
+        Returns read-only views into the ring buffer, not copies; use them
+        right away (the reader thread reuses a slot after RING_SLACK newer samples).
+        """
+        written = self._written
+        first = max(self._cleared_at, written - MAX_SAMPLES)
+        start = first % self._capacity
+        stop = start + (written - first)
+
+        timestamps = self._timestamps[start:stop]
+
+        # Samples are stored in time order, so the range bounds are binary searches
+        lo = 0 if t_start is None else int(np.searchsorted(timestamps, t_start, side='left'))
+        hi = len(timestamps) if t_end is None else int(np.searchsorted(timestamps, t_end, side='right'))
+
+        # Skip the oldest samples if the reader thread lapped them meanwhile
+        lo = max(lo, self._written - self._capacity - first + 1)
+
+        arrays = tuple(
+            buffer[start + lo:start + hi]
+            for buffer in (self._timestamps, self._power_mw, self._energy_mj)
+        )
+        for array in arrays:
+            array.flags.writeable = False
+        return arrays
+
     def clear_samples(self):
         """Clear all stored samples."""
-        with self.lock:
-            self.samples.clear()
+        self._cleared_at = self._written
 
     def get_samples(self, t_start: Optional[float] = None,
                     t_end: Optional[float] = None) -> List[Tuple[float, float]]:
@@ -141,22 +251,14 @@ class TegrastatsMonitor:
         Get power samples within time range.
 
         Args:
-            t_start: Start timestamp (None = from beginning)
-            t_end: End timestamp (None = until now)
+            t_start: Start time.monotonic() timestamp (None = from beginning)
+            t_end: End time.monotonic() timestamp (None = until now)
 
         Returns:
             List of (timestamp, power_mw) tuples
         """
-        with self.lock:
-            samples = list(self.samples)
-
-        if t_start is not None:
-            samples = [(t, p) for t, p in samples if t >= t_start]
-
-        if t_end is not None:
-            samples = [(t, p) for t, p in samples if t <= t_end]
-
-        return samples
+        timestamps, power_mw, _ = self._get_arrays(t_start, t_end)
+        return list(zip(timestamps.tolist(), power_mw.tolist()))
 
     def measure_idle(self, duration_sec: float = 10.0) -> float:
         """
@@ -174,19 +276,18 @@ class TegrastatsMonitor:
         print(f"Measuring idle power for {duration_sec} seconds...")
         self.clear_samples()
 
-        t_start = time.time()
+        t_start = time.monotonic()
         time.sleep(duration_sec)
-        t_end = time.time()
+        t_end = time.monotonic()
 
-        samples = self.get_samples(t_start, t_end)
+        _, power_mw, _ = self._get_arrays(t_start, t_end)
 
-        if not samples:
+        if len(power_mw) == 0:
             raise RuntimeError("No power samples collected. Check tegrastats output.")
 
-        powers = [p for _, p in samples]
-        avg_power = sum(powers) / len(powers)
+        avg_power = float(power_mw.mean())
 
-        print(f"Idle power: {avg_power:.1f} mW (from {len(samples)} samples)")
+        print(f"Idle power: {avg_power:.1f} mW (from {len(power_mw)} samples)")
         return avg_power
 
     def integrate_energy(self, t_start: float, t_end: float,
@@ -195,44 +296,38 @@ class TegrastatsMonitor:
         Calculate energy consumption using trapezoidal integration.
 
         Args:
-            t_start: Start timestamp
-            t_end: End timestamp
+            t_start: Start time.monotonic() timestamp
+            t_end: End time.monotonic() timestamp
             idle_mw: Idle power to subtract (default: 0)
 
         Returns:
             Energy in Joules
         """
-        samples = self.get_samples(t_start, t_end)
+        timestamps, power_mw, energy_mj = self._get_arrays(t_start, t_end)
 
-        if len(samples) < 2:
-            print(f"Warning: Only {len(samples)} samples for energy calculation")
-            if len(samples) == 1:
+        if len(timestamps) < 2:
+            print(f"Warning: Only {len(timestamps)} samples for energy calculation")
+            if len(timestamps) == 1:
                 duration = t_end - t_start
-                power_w = (samples[0][1] - idle_mw) / 1000.0
-                return max(0, power_w * duration)
+                power_w = (power_mw[0] - idle_mw) / 1000.0
+                return max(0, float(power_w) * duration)
             return 0.0
 
-        # Trapezoidal integration: E = ∫P dt
-        energy_j = 0.0
-
-        for i in range(len(samples) - 1):
-            t1, p1 = samples[i]
-            t2, p2 = samples[i + 1]
-
-            # Subtract idle power
-            p1_active = max(0, p1 - idle_mw)
-            p2_active = max(0, p2 - idle_mw)
-
-            # Convert mW to W
-            p1_w = p1_active / 1000.0
-            p2_w = p2_active / 1000.0
+        # Trapezoidal integral of raw power between the first and last sample,
+        # read off the running integral (readings are never negative)
+        raw_mj = float(energy_mj[-1] - energy_mj[0])
+        if idle_mw == 0:
+            return raw_mj * 1e-3
 
-            # Trapezoidal area
-            dt = t2 - t1
-            avg_power = (p1_w + p2_w) / 2.0
-            energy_j += avg_power * dt
+        # While no sample dips below idle the clamp never applies, so the
+        # idle baseline comes off as idle power times duration
+        if power_mw.min() >= idle_mw:
+            return (raw_mj - idle_mw * float(timestamps[-1] - timestamps[0])) * 1e-3
 
-        return energy_j
+        # Otherwise integrate the clamped power above idle: E = ∫P dt = Σ P_i w_i (mW -> W)
+        active_mw = power_mw - idle_mw
+        np.maximum(active_mw, 0.0, out=active_mw)
+        return float(np.dot(active_mw, trapezoid_weights(timestamps))) * 1e-3
 
     def __enter__(self):
         """Context manager entry."""
@@ -255,9 +350,9 @@ if __name__ == "__main__":
 
             # Simulate some work
             print("\nSimulating workload...")
-            t_start = time.time()
+            t_start = time.monotonic()
             time.sleep(3.0)  # Replace with actual work
-            t_end = time.time()
+            t_end = time.monotonic()
 
             # Calculate energy
             energy = monitor.integrate_energy(t_start, t_end, idle_mw=idle_power)